@@ -1,13 +1,29 @@
 import json
 import csv
-import re
 import os
+import threading
 from datetime import datetime
+from task4storage import (
+    FIELDS, JsonStorage, JournalStorage, MergeConflict, SharedJsonStorage, SqliteStorage, SQLITE_SUFFIXES,
+    contact_rows,
+)
+from task4search import PrefixIndex, SortedView, TrigramIndex
+from task4backup import BackupStore
+from task4validation import (
+    validate_name, validate_phone, validate_email, validate_parallel, validate_csv_parallel,
+)
+from task4table import ContactTable
+from task4dedupe import DuplicateFinder
+from task4binary import BinarySnapshot, SnapshotContactView, write_binary_snapshot
+from task4export import export_rows, iter_export
+from task4query import ContactQuery, SqlQuery, parse_query
 
 
 class Contact:
     """Represents a contact with validation."""
 
+    __slots__ = FIELDS
+
     def __init__(self, name, phone, email, address=""):
         self.name = self._validate_name(name)
         self.phone = self._validate_phone(phone)
@@ -15,19 +31,23 @@ class Contact:
         self.address = address
 
     def _validate_name(self, name):
-        if not name.strip():
-            raise ValueError("Name cannot be empty")
-        return name.strip().title()
+        return validate_name(name)
 
     def _validate_phone(self, phone):
-        if not re.match(r"^\+?\d{7,15}$", phone):
-            raise ValueError("Invalid phone number format")
-        return phone
+        return validate_phone(phone)
 
     def _validate_email(self, email):
-        if not re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", email):
-            raise ValueError("Invalid email format")
-        return email.lower()
+        return validate_email(email)
+
+    @classmethod
+    def from_record(cls, name, phone, email, address=""):
+        """Rebuild a contact from already-validated storage, skipping validation"""
+        contact = cls.__new__(cls)
+        contact.name = name
+        contact.phone = phone
+        contact.email = email
+        contact.address = address
+        return contact
 
     def to_dict(self):
         return {
@@ -41,95 +61,615 @@ class Contact:
         return f"{self.name} | {self.phone} | {self.email} | {self.address}"
 
 
-class ContactManager:
-    """Manages contacts with persistence and utilities."""
+def validate_batch(rows, workers=None, chunk_size=10_000):
+    """Validate many raw contacts at once.
+
+    rows are dicts or (name, phone, email[, address]) sequences. With
+    `workers` the rows are validated in chunks on a process pool. Returns
+    (contacts, errors) where errors is [(row index, message)].
+    """
+    valid, errors = validate_parallel(rows, workers, chunk_size)
+    return [Contact.from_record(*fields) for _, fields in valid], errors
+
+
+def validate_columns(names, phones, emails, addresses=None, workers=None, chunk_size=10_000):
+    """validate_batch() for data held as parallel columns"""
+    if addresses is None:
+        rows = zip(names, phones, emails)
+    else:
+        rows = zip(names, phones, emails, addresses)
+    return validate_batch(rows, workers, chunk_size)
+
+
+class ImportReport:
+    """Per-row outcome of a bulk add."""
+
+    def __init__(self):
+        self.added = 0
+        self.rejected = []  # (row number, reason)
+
+    def reject(self, row_number, reason):
+        self.rejected.append((row_number, reason))
+
+    def __str__(self):
+        return f"{self.added} added, {len(self.rejected)} rejected"
+
+
+class ContactBatch:
+    """Context manager that defers persistence until the block exits.
+
+    The whole batch is written with a single storage commit. If the block
+    raises, or the commit fails, the in-memory contacts are rolled back.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.snapshot = None
+
+    def __enter__(self):
+        manager = self.manager
+        if manager._batch_depth == 0:
+            self.snapshot = manager._begin()
+        manager._batch_depth += 1
+        return manager
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        manager = self.manager
+        manager._batch_depth -= 1
+        if manager._batch_depth:
+            return False
+        if exc_type is None:
+            try:
+                manager._flush()
+            except MergeConflict:
+                raise  # the manager already holds the book it lost to
+            except Exception:
+                manager._rollback(self.snapshot)
+                raise
+        else:
+            manager._rollback(self.snapshot)
+        return False  # propagate exceptions
 
-    def __init__(self, storage_file="contacts.json"):
+
+class ContactManager:
+    """Manages contacts with persistence and utilities.
+
+    With journal=True mutations are appended to `<storage_file>.log` instead
+    of rewriting the whole file (see task4storage.JournalStorage). A
+    storage_file ending in .db/.sqlite/.sqlite3 keeps the contacts in SQLite:
+    nothing is loaded up front and `contacts` becomes a lazy view.
+
+    With lazy=True the JSON file is parsed incrementally on a background
+    thread; find_contact answers as soon as the contact has been read, and
+    the other methods wait for the load to finish.
+
+    With binary=True each full save also writes `<storage_file>.bin`, a
+    memory-mapped snapshot (see task4binary). When it still matches the
+    JSON file, loading only maps it: `contacts` becomes a view decoding
+    records on access and find_contact binary-searches the file. The
+    first call that needs the full in-memory book (a mutation, search,
+    sorting, ...) decodes everything once.
+
+    With shared=True several processes can work on the same JSON file:
+    writes are serialized with a file lock, a write based on an outdated
+    copy is merged with the newer file instead of overwriting it, and
+    refresh() reloads only when another process has written since. A
+    mutation that collides with another process's change raises
+    ValueError("Duplicate contact detected") and the book is replaced with
+    the stored one, the way a local duplicate would have been refused.
+    """
+
+    def __init__(self, storage_file="contacts.json", journal=False, lazy=False, binary=False, shared=False):
         self.storage_file = storage_file
+        if storage_file.endswith(SQLITE_SUFFIXES):
+            self.storage = SqliteStorage(storage_file)
+        elif shared:
+            self.storage = SharedJsonStorage(storage_file, binary=binary)
+        elif journal:
+            self.storage = JournalStorage(storage_file, binary=binary)
+        else:
+            self.storage = JsonStorage(storage_file, binary=binary)
+        self._sql = isinstance(self.storage, SqliteStorage)
         self.contacts = []
+        self._by_phone = {}
+        self._by_email = {}
+        self._order = {}  # contact -> position key, keeps search results in list order
+        self._next_order = 0
+        self._indexes = []  # secondary indexes, built on first use
+        self._trigrams = None
+        self._prefixes = None
+        self._sorted_views = {}
+        self._batch_depth = 0
+        self._pending = []
+        self.lazy = lazy
+        self._loader = None
+        self._load_error = None
+        self._progress = threading.Condition()
+        self._snapshot = None  # mapped BinarySnapshot serving reads until materialized
         self.load()
 
+    # ---------- Indexes ----------
+    def _index(self, contact):
+        self._by_phone[contact.phone] = contact
+        self._by_email[contact.email] = contact
+        self._order[contact] = self._next_order
+        self._next_order += 1
+        for index in self._indexes:
+            index.add(contact)
+
+    def _unindex(self, contact):
+        self._by_phone.pop(contact.phone, None)
+        self._by_email.pop(contact.email, None)
+        self._order.pop(contact, None)
+        for index in self._indexes:
+            index.remove(contact)
+
+    def _reindex(self):
+        """Rebuild every index from self.contacts"""
+        self._by_phone = {c.phone: c for c in self.contacts}
+        self._by_email = {c.email: c for c in self.contacts}
+        self._renumber()
+        for index in self._indexes:
+            index.rebuild(self.contacts)
+
+    def _renumber(self):
+        self._order = {c: i for i, c in enumerate(self.contacts)}
+        self._next_order = len(self.contacts)
+
+    def _add_index(self, index):
+        """Register a secondary index so add/remove/load keep it up to date"""
+        self.wait_until_loaded()
+        index.rebuild(self.contacts)
+        self._indexes.append(index)
+        return index
+
+    def _trigram_index(self):
+        if self._trigrams is None:
+            self._trigrams = self._add_index(TrigramIndex())
+        return self._trigrams
+
+    def _prefix_index(self):
+        if self._prefixes is None:
+            self._prefixes = self._add_index(PrefixIndex())
+        return self._prefixes
+
+    def _sorted_view(self, by):
+        if by not in self._sorted_views:
+            self._sorted_views[by] = self._add_index(SortedView(by))
+        return self._sorted_views[by]
+
     # ---------- Persistence ----------
     def load(self):
-        """Load contacts from JSON file"""
-        if os.path.exists(self.storage_file):
-            with open(self.storage_file, "r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                    self.contacts = [Contact(**c) for c in data]
-                except json.JSONDecodeError:
-                    self.contacts = []
+        """Load contacts from JSON file (and replay the journal, if any)"""
+        if self._sql:
+            self.contacts = self.storage.view(Contact.from_record)
+            return
+        self._snapshot = None
+        self.wait_until_loaded()
+        self.contacts = []
+        self._reindex()
+        snapshot = self.storage.open_binary()
+        if snapshot is not None:
+            # O(1): nothing is decoded until it is read or _materialize() runs
+            self.contacts = SnapshotContactView(snapshot, Contact.from_record)
+            self._snapshot = snapshot
+            return
+        if self.lazy:
+            self._loader = threading.Thread(target=self._load_records, name="contacts-loader")
+            self._loader.start()
         else:
+            self._load_records()
+
+    def _load_records(self, notify_every=1024):
+        """Parse the stored records one by one, indexing each as it arrives"""
+        try:
+            for count, contact in enumerate(self._stored_contacts(), start=1):
+                self.contacts.append(contact)
+                self._index(contact)
+                if count % notify_every == 0:
+                    with self._progress:
+                        self._progress.notify_all()
+        except json.JSONDecodeError:
             self.contacts = []
+            self._reindex()
+        except Exception as e:
+            if not self.lazy:
+                raise
+            self._load_error = e
+        finally:
+            with self._progress:
+                self._loader = None
+                self._progress.notify_all()
+
+    def _stored_contacts(self):
+        for record in self.storage.iter_load():
+            yield Contact(**record)
+
+    def _materialize(self):
+        """Decode a mapped snapshot into the in-memory book and its indexes"""
+        with self._progress:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            # Written from validated contacts, so validation is skipped
+            self.contacts = [Contact.from_record(*row) for row in snapshot]
+            self._reindex()
+            # Not closed: a concurrent find_contact may still be reading it
+            self._snapshot = None
+
+    def refresh(self):
+        """Reload if the stored contacts changed since we read them; True if so"""
+        self.wait_until_loaded()
+        if self._pending or not self.storage.changed():
+            return False
+        self.load()
+        self.wait_until_loaded()
+        return True
+
+    def wait_until_loaded(self):
+        """Block until a lazy load has finished; re-raise its error, if any"""
+        if self._snapshot is not None:
+            self._materialize()
+        with self._progress:
+            while self._loader is not None:
+                self._progress.wait()
+        if self._load_error is not None:
+            error, self._load_error = self._load_error, None
+            raise error
 
     def save(self):
         """Save contacts to JSON file"""
-        with open(self.storage_file, "w", encoding="utf-8") as f:
-            json.dump([c.to_dict() for c in self.contacts], f, indent=4)
+        self.wait_until_loaded()
+        self.storage.save(self.contacts)
+
+    def _commit(self, op, contact):
+        """Persist a mutation now, or once at the end of the current batch"""
+        self._pending.append((op, contact))
+        if not self._batch_depth:
+            try:
+                self._flush()
+            except MergeConflict:
+                raise
+            except Exception:
+                self._revert([(op, contact)])
+                raise
+
+    def _flush(self):
+        changes, self._pending = self._pending, []
+        if changes:
+            try:
+                merged = self.storage.commit(self.contacts, changes)
+            except MergeConflict as e:
+                self._adopt(e.records)  # drops our losing changes
+                raise
+            if merged is not None:
+                self._adopt(merged)
+
+    def _adopt(self, records):
+        """Replace the book with records merged from another writer's changes.
+
+        Changes still queued in _pending are re-applied on top, so they stay
+        visible until their own commit.
+        """
+        contacts = {r["phone"]: Contact.from_record(**r) for r in records}
+        emails = {c.email for c in contacts.values()}
+        for op, contact in self._pending:
+            if op == "add":
+                if contact.phone not in contacts and contact.email not in emails:
+                    contacts[contact.phone] = contact
+                    emails.add(contact.email)
+            else:
+                contacts.pop(contact.phone, None)
+        self.contacts = list(contacts.values())
+        self._reindex()
+
+    def _begin(self):
+        """Remember what a batch rollback has to restore"""
+        self.wait_until_loaded()
+        return None if self._sql else list(self.contacts)
+
+    def _rollback(self, snapshot):
+        self._pending = []
+        if self._sql:
+            self.storage.rollback()
+        else:
+            self.contacts = snapshot
+            self._reindex()
+
+    def _revert(self, changes):
+        """Take the in-memory effect of uncommitted changes back out, newest first.
+
+        For SQLite this rolls back the open transaction, which also drops
+        any change queued after `changes`.
+        """
+        if self._sql:
+            self.storage.rollback()
+            return
+        for op, contact in reversed(changes):
+            if op == "add":
+                if self._by_phone.get(contact.phone) is contact:
+                    self.contacts.remove(contact)
+                    self._unindex(contact)
+            elif self.find_contact(contact.phone) is None and self.find_contact(contact.email) is None:
+                self.contacts.append(contact)
+                self._index(contact)
+
+    def batch(self):
+        """Group several mutations into one commit: `with manager.batch(): ...`"""
+        return ContactBatch(self)
 
     # ---------- Core Features ----------
     def add_contact(self, contact):
+        self.wait_until_loaded()
         if self.find_contact(contact.phone) or self.find_contact(contact.email):
             raise ValueError("Duplicate contact detected")
-        self.contacts.append(contact)
-        self.save()
+        if self._sql:
+            self.storage.insert(contact)
+        else:
+            self.contacts.append(contact)
+            self._index(contact)
+        self._commit("add", contact)
 
     def remove_contact(self, phone):
+        self.wait_until_loaded()
         contact = self.find_contact(phone)
         if contact:
-            self.contacts.remove(contact)
-            self.save()
+            if self._sql:
+                self.storage.delete(contact)
+            else:
+                self.contacts.remove(contact)
+                self._unindex(contact)
+            self._commit("remove", contact)
             return True
         return False
 
+    def add_contacts(self, rows, start=1, workers=None):
+        """Validate, deduplicate and add many contacts with a single commit.
+
+        rows may hold Contact objects or dicts of Contact fields. Rejected
+        rows are reported by their position (counted from `start`) instead
+        of aborting the import. With `workers`, raw rows are validated on a
+        process pool first (see validate_batch).
+        """
+        if workers:
+            # Contacts do not unpack like the field tuples validate_rows takes
+            rows = ((r.name, r.phone, r.email, r.address) if isinstance(r, Contact) else r for r in rows)
+            return self._add_validated(*validate_parallel(rows, workers, start=start))
+        return self._add_numbered(enumerate(rows, start=start))
+
+    def _add_numbered(self, numbered_rows):
+        """add_contacts() for (row number, row) pairs"""
+        report = ImportReport()
+        with self.batch():
+            for row_number, row in numbered_rows:
+                try:
+                    contact = row if isinstance(row, Contact) else Contact(**row)
+                    self.add_contact(contact)
+                except (TypeError, ValueError, AttributeError) as e:
+                    report.reject(row_number, str(e))
+                else:
+                    report.added += 1
+        return report
+
+    def _add_validated(self, valid, errors):
+        """Add already-validated (row_number, fields) rows in order, deduplicating"""
+        report = ImportReport()
+        report.rejected.extend(errors)
+        with self.batch():
+            for row_number, fields in valid:
+                try:
+                    self.add_contact(Contact.from_record(*fields))
+                except ValueError as e:
+                    report.reject(row_number, str(e))
+                else:
+                    report.added += 1
+        report.rejected.sort()
+        return report
+
     def find_contact(self, keyword):
-        """Find by phone or email"""
-        for c in self.contacts:
-            if c.phone == keyword or c.email == keyword:
-                return c
-        return None
+        """Find by phone or email (O(1) hash lookup)"""
+        if self._sql:
+            row = self.storage.find(keyword)
+            return Contact.from_record(*row) if row else None
+        snapshot = self._snapshot
+        if snapshot is not None:
+            row = snapshot.find(keyword)
+            return Contact.from_record(*row) if row else None
+        contact = self._by_phone.get(keyword) or self._by_email.get(keyword)
+        if contact is None and self._loader is not None:
+            # Still loading: wait for more records until it shows up or the load ends
+            with self._progress:
+                while True:
+                    contact = self._by_phone.get(keyword) or self._by_email.get(keyword)
+                    if contact is not None or self._loader is None:
+                        break
+                    self._progress.wait()
+        return contact
 
     def search(self, keyword):
         """Search by name, phone, email, or address"""
+        if self._sql:
+            return [Contact.from_record(*row) for row in self.storage.search(keyword)]
+        self.wait_until_loaded()
+        needle = keyword.lower()
+        hits = None
+        if len(needle) >= 3:
+            hits = self._trigram_index().candidates(needle, max(64, len(self.contacts) // 8))
+        if hits is None:
+            candidates = self.contacts  # short or unselective keyword: scan
+        else:
+            # Trigram candidates, verified below and returned in list order
+            candidates = sorted(hits, key=self._order.__getitem__)
         return [
-            c for c in self.contacts
-            if keyword.lower() in c.name.lower()
+            c for c in candidates
+            if needle in c.name.lower()
             or keyword in c.phone
-            or keyword.lower() in c.email.lower()
-            or keyword.lower() in c.address.lower()
+            or needle in c.email.lower()
+            or needle in c.address.lower()
         ]
 
+    def query(self, text):
+        """Structured search: `query('name^="Aj" and address~"street"')`.
+
+        Returns a lazy iterable of matching contacts; its explain() shows
+        which index answers the query. See task4query.parse_query for the
+        syntax and ContactQuery for how the plan is chosen.
+        """
+        predicates = parse_query(text)
+        if self._sql:
+            return SqlQuery(self.storage, predicates, Contact.from_record)
+        self.wait_until_loaded()
+        return ContactQuery(self, predicates)
+
+    def autocomplete(self, prefix, limit=10):
+        """Up to `limit` contacts whose name or email starts with prefix
+        (case-insensitive), ordered by the matching name/email.
+
+        Answered from a prefix index that add/remove keep current, so only
+        the returned entries are read.
+        """
+        if not prefix:
+            return []
+        if self._sql:
+            return [Contact.from_record(*row) for row in self.storage.autocomplete(prefix, limit)]
+        self.wait_until_loaded()
+        return self._prefix_index().complete(prefix, limit)
+
     def sort_contacts(self, by="name"):
-        """Sort contacts by a field"""
+        """Sort contacts by a field (indexes hold the objects, so they stay valid)"""
+        self._check_sort_field(by)
+        self.wait_until_loaded()
+        if self._sql:
+            self.storage.order_by = by
+            return
+        self.contacts.sort(key=lambda c: getattr(c, by))
+        self._renumber()
+
+    @staticmethod
+    def _check_sort_field(by):
         if by not in {"name", "phone", "email"}:
             raise ValueError("Can only sort by name, phone, or email")
-        self.contacts.sort(key=lambda c: getattr(c, by))
+
+    def sorted_contacts(self, by="name"):
+        """Contacts ordered by a field, leaving self.contacts in insertion order.
+
+        Served from a sorted view that add/remove keep current, so no sort
+        runs per call.
+        """
+        self._check_sort_field(by)
+        if self._sql:
+            return [Contact.from_record(*row) for row in self.storage.rows(order_by=by)]
+        return list(self._sorted_view(by).items)
+
+    def page(self, by="name", after=None, limit=50):
+        """One page of contacts ordered by `by`.
+
+        Returns (contacts, cursor); pass the cursor back as `after` for the
+        next page, it is None on the last page. `after` may also be a plain
+        field value to start after it.
+        """
+        self._check_sort_field(by)
+        if isinstance(after, str):
+            after = (after, "\U0010ffff")  # past every contact with that value
+        if self._sql:
+            rows, cursor = self.storage.page(by, after, limit)
+            return [Contact.from_record(*row) for row in rows], cursor
+        return self._sorted_view(by).page(after, limit)
+
+    def find_duplicates(self, threshold=0.8):
+        """Clusters of contacts that are probably the same person.
+
+        Catches near-duplicates that add_contact's exact checks let through:
+        reformatted phones and similar name/address text
+        (Jaccard >= threshold). See task4dedupe.DuplicateFinder.
+        """
+        self.wait_until_loaded()
+        return DuplicateFinder(threshold).clusters(self.contacts)
 
     # ---------- Import / Export ----------
     def export_to_csv(self, filename="contacts.csv"):
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["name", "phone", "email", "address"])
-            writer.writeheader()
-            for c in self.contacts:
-                writer.writerow(c.to_dict())
-
-    def import_from_csv(self, filename):
-        with open(filename, "r", encoding="utf-8") as f:
+        return self.export(filename, "csv")
+
+    def export(self, filename, fmt=None, compression=None, rows_per_file=None):
+        """Stream the contacts to csv/json/ndjson, optionally gzip/lzma
+        compressed and split into files of rows_per_file; returns the paths.
+
+        Format and compression follow the file name ('contacts.ndjson.gz')
+        unless given. See task4export.export_rows.
+        """
+        self.wait_until_loaded()
+        return export_rows(contact_rows(self.contacts), filename, fmt, compression, rows_per_file)
+
+    def export_stream(self, fmt="csv"):
+        """Generator of export text pieces, for writing anywhere"""
+        self.wait_until_loaded()
+        return iter_export(contact_rows(self.contacts), fmt)
+
+    def to_table(self):
+        """Copy the contacts into a column-wise ContactTable"""
+        self.wait_until_loaded()
+        return ContactTable.from_contacts(self.contacts)
+
+    def import_from_csv(self, filename, workers=None):
+        """Import a CSV file in one batch; returns an ImportReport.
+
+        Rejected rows are reported by the file line they end on, so blank
+        lines are counted. With `workers` the file is split into byte-range
+        shards that are parsed and validated in worker processes; duplicates
+        are still resolved here, in file order, so the result matches a
+        serial import. Quoted fields must not span lines in that mode.
+        """
+        if workers:
+            return self._add_validated(*validate_csv_parallel(filename, workers))
+        with open(filename, "r", encoding="utf-8", newline="") as f:
             reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    self.add_contact(Contact(**row))
-                except ValueError as e:
-                    print(f"Skipping invalid/duplicate contact: {e}")
+            return self._add_numbered((reader.line_num, row) for row in reader)
+
+    @staticmethod
+    def open_snapshot(path):
+        """Open a binary snapshot read-only in O(1), e.g. to serve lookups
+        with `snapshot.find(keyword)` before (or instead of) a full load"""
+        return BinarySnapshot(path)
 
     # ---------- Backup ----------
-    def backup(self):
-        backup_file = f"backup_contacts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(backup_file, "w", encoding="utf-8") as f:
-            json.dump([c.to_dict() for c in self.contacts], f, indent=4)
+    def backup(self, binary=False, compression=None):
+        """Write a timestamped JSON copy (plus a .bin snapshot if binary=True).
+
+        compression="gzip" or "lzma" writes backup_contacts_<time>.json.gz/.xz.
+        """
+        self.wait_until_loaded()
+        name = f"backup_contacts_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        backup_file = name + ".json" + {None: "", "gzip": ".gz", "lzma": ".xz"}[compression]
+        export_rows(contact_rows(self.contacts), backup_file, "json", compression)
+        if binary:
+            write_binary_snapshot(name + ".bin", contact_rows(self.contacts), backup_file)
         return backup_file
 
+    def incremental_backup(self, directory="backups"):
+        """Back up only what changed since earlier backups in `directory`.
+
+        Returns (backup_id, bytes_written); see task4backup.BackupStore.
+        """
+        self.wait_until_loaded()
+        return BackupStore(directory).backup(c.to_dict() for c in self.contacts)
+
+    def restore_backup(self, backup_id, directory="backups"):
+        """Replace all contacts with those of an incremental backup"""
+        contacts = [Contact.from_record(**r) for r in BackupStore(directory).restore(backup_id)]
+        if self._sql:
+            with self.batch():
+                for contact in list(self.contacts):
+                    self.remove_contact(contact.phone)
+                for contact in contacts:
+                    self.add_contact(contact)
+            return
+        self.wait_until_loaded()
+        self.contacts = contacts
+        self._reindex()
+        self.save()
+
     def display_all(self):
+        self.wait_until_loaded()
         for c in self.contacts:
             print(c)
 
@@ -183,8 +723,8 @@ if __name__ == "__main__":
 
             elif choice == "5":
                 by = input("Sort by (name/phone/email): ")
-                manager.sort_contacts(by)
-                manager.display_all()
+                for c in manager.sorted_contacts(by):
+                    print(c)
 
             elif choice == "6":
                 manager.export_to_csv()
@@ -192,8 +732,10 @@ if __name__ == "__main__":
 
             elif choice == "7":
                 filename = input("Enter CSV filename: ")
-                manager.import_from_csv(filename)
-                print("✅ Imported contacts")
+                report = manager.import_from_csv(filename)
+                for line, reason in report.rejected:
+                    print(f"Skipping line {line}: {reason}")
+                print(f"✅ Imported contacts ({report})")
 
             elif choice == "8":
                 backup_file = manager.backup()
@@ -0,0 +1,130 @@
+import asyncio
+from task4 import ContactManager
+from task4storage import MergeConflict
+
+
+class AsyncContactManager:
+    """asyncio front end for ContactManager with coalesced, off-loop writes.
+
+    Mutations update the in-memory book immediately (duplicates still raise
+    right away) and return once the change is durable. Changes arriving
+    within `delay` seconds of each other, or while a write is running, are
+    written together by one storage commit on a worker thread, so the event
+    loop never blocks on disk I/O. If that commit fails, its changes are
+    taken back out of the book and every mutation waiting on it raises.
+
+    Use `await AsyncContactManager.open(...)` so the initial load also runs
+    off the loop, and `await close()` (or `async with`) to flush at the end.
+    Closing twice is harmless; mutating after close raises ValueError.
+    """
+
+    def __init__(self, manager, delay=0.01):
+        self.manager = manager
+        self.delay = delay
+        self._waiters = []  # futures of changes not yet written
+        self._writer = None
+        self._closed = False
+        # Keep the manager in batch mode: mutations only queue their changes
+        manager._batch_depth += 1
+
+    @classmethod
+    async def open(cls, storage_file="contacts.json", delay=0.01, **kwargs):
+        manager = await asyncio.to_thread(ContactManager, storage_file, **kwargs)
+        return cls(manager, delay)
+
+    # ---------- Reads (in memory, no I/O) ----------
+    def find_contact(self, keyword):
+        return self.manager.find_contact(keyword)
+
+    def search(self, keyword):
+        return self.manager.search(keyword)
+
+    def page(self, by="name", after=None, limit=50):
+        return self.manager.page(by, after, limit)
+
+    # ---------- Mutations ----------
+    async def add_contact(self, contact):
+        self._check_open()
+        self.manager.add_contact(contact)
+        await self._durable()
+
+    async def add_contacts(self, rows, start=1):
+        self._check_open()
+        report = self.manager.add_contacts(rows, start)
+        await self._durable()
+        return report
+
+    async def remove_contact(self, phone):
+        self._check_open()
+        removed = self.manager.remove_contact(phone)
+        if removed:
+            await self._durable()
+        return removed
+
+    def _check_open(self):
+        if self._closed:
+            raise ValueError("AsyncContactManager is closed")
+
+    def _durable(self):
+        """Future that resolves once the changes queued so far are on disk"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_pending())
+        return future
+
+    async def _write_pending(self):
+        await asyncio.sleep(self.delay)  # debounce: let a burst accumulate
+        manager = self.manager
+        while self._waiters:
+            waiters, self._waiters = self._waiters, []
+            changes, manager._pending = manager._pending, []
+            # The loop keeps mutating manager.contacts while the thread writes
+            contacts = manager.contacts if manager._sql else list(manager.contacts)
+            try:
+                merged = await asyncio.to_thread(manager.storage.commit, contacts, changes)
+            except MergeConflict as e:
+                manager._adopt(e.records)  # the whole commit lost; queued changes are re-applied
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+            except Exception as e:
+                manager._revert(changes)
+                if manager._sql:
+                    # The rollback also dropped what was queued meanwhile
+                    manager._pending = []
+                    waiters += self._waiters
+                    self._waiters = []
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+            else:
+                if merged is not None:
+                    manager._adopt(merged)
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+        self._writer = None
+
+    async def flush(self):
+        """Wait until every change so far is durable"""
+        if self.manager._pending or self._waiters:
+            await self._durable()
+        elif self._writer is not None:
+            await asyncio.shield(self._writer)
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.flush()
+        finally:
+            self.manager._batch_depth -= 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+
+class BackupStore:
+    """Content-addressed store for incremental contact backups.
+
+    Every contact record is stored once in an append-only pack file, keyed
+    by the SHA-256 of its canonical JSON. A backup is a list of chunk
+    hashes; each chunk lists the record hashes of a run of contacts and is
+    stored the same way. Chunk boundaries depend on record hashes rather than
+    positions, so adding or removing a contact changes only the chunk around
+    it, and a backup writes only new records, new chunks and its manifest.
+
+    Layout under `directory`:
+        objects.pack             concatenated objects
+        objects.idx              one "hash offset length" line per object
+        manifests/<id>.json      {"created": ..., "chunks": [hash, ...]}
+    """
+
+    CHUNK_MASK = 0xFF  # a record whose hash ends in 0x00 closes a chunk (~256 per chunk)
+
+    def __init__(self, directory="backups"):
+        self.directory = directory
+        self.pack_path = os.path.join(directory, "objects.pack")
+        self.index_path = os.path.join(directory, "objects.idx")
+        self.manifest_dir = os.path.join(directory, "manifests")
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        self.objects = {}  # hash -> (offset, length)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    digest, offset, length = line.split()
+                    self.objects[digest] = (int(offset), int(length))
+
+    @staticmethod
+    def _encode(obj):
+        data = json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(data).hexdigest(), data
+
+    def backup(self, records):
+        """Store an iterable of contact dicts; returns (backup_id, bytes_written)"""
+        new_objects = []  # (hash, bytes) not yet in the pack
+        pending = set()
+        chunks = []
+        chunk = []
+
+        def put(obj):
+            digest, data = self._encode(obj)
+            if digest not in self.objects and digest not in pending:
+                pending.add(digest)
+                new_objects.append((digest, data))
+            return digest
+
+        for record in records:
+            digest = put(record)
+            chunk.append(digest)
+            if int(digest[-2:], 16) & self.CHUNK_MASK == 0:
+                chunks.append(put(chunk))
+                chunk = []
+        if chunk:
+            chunks.append(put(chunk))
+
+        written = self._append(new_objects)
+        backup_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        manifest = json.dumps({"created": backup_id, "chunks": chunks}).encode("utf-8")
+        manifest_path = os.path.join(self.manifest_dir, f"{backup_id}.json")
+        with open(manifest_path + ".tmp", "wb") as f:
+            f.write(manifest)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest_path + ".tmp", manifest_path)
+        return backup_id, written + len(manifest)
+
+    def _append(self, new_objects):
+        if not new_objects:
+            return 0
+        index_lines = []
+        with open(self.pack_path, "ab") as pack:
+            offset = pack.seek(0, os.SEEK_END)
+            for digest, data in new_objects:
+                pack.write(data)
+                index_lines.append(f"{digest} {offset} {len(data)}\n")
+                self.objects[digest] = (offset, len(data))
+                offset += len(data)
+            pack.flush()
+            os.fsync(pack.fileno())
+        index = "".join(index_lines).encode("utf-8")
+        with open(self.index_path, "ab") as f:
+            f.write(index)
+            f.flush()
+            os.fsync(f.fileno())
+        return sum(len(data) for _, data in new_objects) + len(index)
+
+    def backups(self):
+        """Backup ids, oldest first"""
+        return sorted(name[:-5] for name in os.listdir(self.manifest_dir) if name.endswith(".json"))
+
+    def restore(self, backup_id):
+        """Yield the contact dicts of a backup, in their original order"""
+        with open(os.path.join(self.manifest_dir, f"{backup_id}.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(self.pack_path, "rb") as pack:
+            for chunk_digest in manifest["chunks"]:
+                for digest in self._read(pack, chunk_digest):
+                    yield self._read(pack, digest)
+
+    def _read(self, pack, digest):
+        offset, length = self.objects[digest]
+        pack.seek(offset)
+        return json.loads(pack.read(length))
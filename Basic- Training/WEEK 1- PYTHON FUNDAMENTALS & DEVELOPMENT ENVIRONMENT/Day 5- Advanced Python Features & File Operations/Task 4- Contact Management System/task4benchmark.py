@@ -0,0 +1,372 @@
+import csv
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from task4 import Contact, ContactManager, ContactTable, validate_batch
+from task4query import matches, parse_query
+from task4external import dedupe_csv
+from task4versions import VersionedContactManager
+
+
+def make_rows(n):
+    """Generate n unique, valid contact rows"""
+    return [
+        {
+            "name": f"Person {i}",
+            "phone": f"{9000000000 + i}",
+            "email": f"person{i}@mail.com",
+            "address": f"{i} Main Street",
+        }
+        for i in range(n)
+    ]
+
+
+def write_csv(filename, rows):
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["name", "phone", "email", "address"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def bench_import(sizes=(10_000, 20_000, 40_000, 80_000)):
+    """Import time should grow linearly with the number of rows"""
+    print("=== import_from_csv ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in sizes:
+            source = os.path.join(tmpdir, f"contacts_{n}.csv")
+            write_csv(source, make_rows(n))
+            manager = ContactManager(os.path.join(tmpdir, f"contacts_{n}.json"))
+            start = time.perf_counter()
+            manager.import_from_csv(source)
+            elapsed = time.perf_counter() - start
+            print(f"{n:>8} rows: {elapsed:.3f}s ({elapsed / n * 1e6:.1f} µs/row)")
+
+
+def bench_single_add(n=50_000, adds=200):
+    """Cost of one add_contact on a large book: full rewrite vs journal append"""
+    print("=== add_contact on a large book ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for journal in (False, True):
+            manager = ContactManager(os.path.join(tmpdir, f"book_{journal}.json"), journal=journal)
+            manager.add_contacts(make_rows(n))
+            start = time.perf_counter()
+            for i in range(adds):
+                manager.add_contact(Contact("Extra", f"{8000000000 + i}", f"extra{i}@mail.com"))
+            elapsed = time.perf_counter() - start
+            label = "journal" if journal else "json"
+            print(f"{label:>8}: {elapsed / adds * 1e3:.2f} ms/add")
+            if journal:
+                manager.storage.wait()
+
+
+def bench_search(n=200_000, queries=("person 1234", "main st", "9000123", "nobody")):
+    """Trigram-indexed search vs the full scan it replaced"""
+    print("=== search ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ContactManager(os.path.join(tmpdir, "contacts.json"))
+        manager.add_contacts(make_rows(n))
+        start = time.perf_counter()
+        manager.search("warm up")  # builds the index
+        print(f"index build for {n} contacts: {time.perf_counter() - start:.2f}s")
+        for keyword in queries:
+            needle = keyword.lower()
+            start = time.perf_counter()
+            [c for c in manager.contacts if needle in c.name.lower() or keyword in c.phone
+             or needle in c.email.lower() or needle in c.address.lower()]
+            scan = time.perf_counter() - start
+            start = time.perf_counter()
+            hits = manager.search(keyword)
+            indexed = time.perf_counter() - start
+            print(f"{keyword!r:>14}: {len(hits):>6} hits, scan {scan * 1e3:.1f} ms, indexed {indexed * 1e3:.3f} ms")
+
+
+def bench_load(n=100_000):
+    """Peak memory of a full load, and time until the first lookup succeeds"""
+    print("=== load ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = os.path.join(tmpdir, "contacts.json")
+        ContactManager(storage).add_contacts(make_rows(n))
+        tracemalloc.start()
+        ContactManager(storage)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"streaming load of {n} contacts: peak {peak / 2**20:.1f} MiB "
+              f"(file {os.path.getsize(storage) / 2**20:.1f} MiB)")
+        start = time.perf_counter()
+        lazy = ContactManager(storage, lazy=True)
+        lazy.find_contact("person10@mail.com")
+        first = time.perf_counter() - start
+        lazy.wait_until_loaded()
+        total = time.perf_counter() - start
+        print(f"lazy: first lookup after {first * 1e3:.1f} ms, fully loaded after {total * 1e3:.0f} ms")
+
+
+def bench_backup(n=100_000, changes=100):
+    """Bytes written by a full backup vs an incremental one after a few changes"""
+    print("=== backup ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ContactManager(os.path.join(tmpdir, "contacts.json"))
+        manager.add_contacts(make_rows(n))
+        store = os.path.join(tmpdir, "backups")
+        _, first = manager.incremental_backup(store)
+        with manager.batch():
+            for i in range(changes):
+                manager.remove_contact(f"{9000000000 + i * 7}")
+                manager.add_contact(Contact("Extra", f"{8000000000 + i}", f"extra{i}@mail.com"))
+        start = time.perf_counter()
+        _, second = manager.incremental_backup(store)
+        elapsed = time.perf_counter() - start
+        print(f"first backup: {first / 2**20:.1f} MiB; after {changes} changes: "
+              f"{second / 2**10:.1f} KiB in {elapsed * 1e3:.0f} ms")
+
+
+def bench_validate(n=400_000, workers=4):
+    """Per-object Contact() vs batch validation, serial and on a process pool"""
+    print("=== validation ===")
+    rows = make_rows(n)
+    start = time.perf_counter()
+    [Contact(**row) for row in rows]
+    print(f"Contact(**row): {time.perf_counter() - start:.2f}s")
+    for label, pool in (("validate_batch", None), (f"validate_batch x{workers}", workers)):
+        start = time.perf_counter()
+        validate_batch(rows, workers=pool, chunk_size=20_000)
+        print(f"{label}: {time.perf_counter() - start:.2f}s")
+
+
+class DictContact:
+    """The pre-__slots__ Contact layout, for comparison"""
+
+    def __init__(self, name, phone, email, address=""):
+        self.name = name
+        self.phone = phone
+        self.email = email
+        self.address = address
+
+
+def bench_memory(n=100_000):
+    """Bytes per contact, strings included, for each in-memory representation"""
+    print("=== memory per contact ===")
+    # Parsed fresh for every run, so strings are separate objects as after load()
+    raw = json.dumps([[r["name"], r["phone"], r["email"], "Main Street"] for r in make_rows(n)])
+    builders = {
+        "dict-based Contact": lambda rows: [DictContact(*row) for row in rows],
+        "__slots__ Contact": lambda rows: [Contact.from_record(*row) for row in rows],
+        "ContactTable": ContactTable,
+    }
+    for label, build in builders.items():
+        tracemalloc.start()
+        rows = json.loads(raw)
+        kept = build(rows)
+        del rows
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        print(f"{label:>20}: {size / n:.0f} bytes")
+
+
+def bench_duplicates(n=200_000, seed=7):
+    """find_duplicates on varied data where every 100th contact has a near-duplicate"""
+    print("=== find_duplicates ===")
+    rng = random.Random(seed)
+    first = ["Ajay", "Sanjay", "Priya", "Anita", "Rahul", "Meera", "Vikram", "Neha", "Arjun", "Kavya"]
+    last = ["Sharma", "Verma", "Gupta", "Iyer", "Nair", "Reddy", "Khan", "Das", "Singh", "Patel"]
+    streets = ["Main", "Builder", "Lake", "Hill", "Park", "Temple", "Station", "Market"]
+    rows = []
+    for i in range(n):
+        rows.append({
+            "name": f"{rng.choice(first)} {rng.choice(last)} {rng.choice(last)}",
+            "phone": f"{9000000000 + i}",
+            "email": f"person{i}@mail.com",
+            "address": f"{rng.randint(1, 9999)} {rng.choice(streets)} Street, Block {rng.randint(1, 500)}",
+        })
+    for i in range(0, n, 100):
+        rows.append({"name": rows[i]["name"].upper() + " ", "phone": "+91" + rows[i]["phone"],
+                     "email": f"dup{i}@other.com", "address": rows[i]["address"].replace(",", "")})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ContactManager(os.path.join(tmpdir, "contacts.json"))
+        manager.add_contacts(rows)
+        start = time.perf_counter()
+        clusters = manager.find_duplicates()
+        elapsed = time.perf_counter() - start
+        largest = max((len(c) for c in clusters), default=0)
+        print(f"{len(manager.contacts)} contacts: {len(clusters)} clusters "
+              f"(largest {largest}) in {elapsed:.1f}s")
+
+
+def bench_startup(n=200_000):
+    """Cold start from JSON, from the binary snapshot, and opening it via mmap"""
+    print("=== startup ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = os.path.join(tmpdir, "contacts.json")
+        ContactManager(storage, binary=True).add_contacts(make_rows(n))
+        for label, start_up in (
+            ("json load", lambda: ContactManager(storage)),
+            ("binary load", lambda: ContactManager(storage, binary=True)),
+            ("open_snapshot + find", lambda: ContactManager.open_snapshot(storage + ".bin").find("person7@mail.com")),
+        ):
+            start = time.perf_counter()
+            start_up()
+            print(f"{label:>22}: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+def bench_export(n=200_000):
+    """Export time, file size and peak extra memory per format/compression"""
+    print("=== export ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ContactManager(os.path.join(tmpdir, "contacts.json"))
+        manager.add_contacts(make_rows(n))
+        for name, rows_per_file in (("c.csv", None), ("c.csv.gz", None), ("c.ndjson.xz", None),
+                                    ("c.json", None), ("c.csv", 50_000)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            paths = manager.export(os.path.join(tmpdir, name), rows_per_file=rows_per_file)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            size = sum(os.path.getsize(p) for p in paths)
+            print(f"{name:>12} x{len(paths)}: {elapsed * 1e3:7.0f} ms, {size / 1e6:6.1f} MB, "
+                  f"peak {peak / 1e6:.1f} MB")
+
+
+def bench_autocomplete(n=200_000, prefixes=("p", "person 12", "person99", "nobody")):
+    """autocomplete() against search() + sort + slice, the old way to do it"""
+    print("=== autocomplete ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for storage in ("contacts.json", "contacts.db"):
+            manager = ContactManager(os.path.join(tmpdir, storage))
+            manager.add_contacts(make_rows(n))
+            start = time.perf_counter()
+            manager.autocomplete("warm up")  # builds the index
+            print(f"{storage}: index build {time.perf_counter() - start:.2f}s")
+            manager.search("warm up")  # and the trigram index behind search()
+            for prefix in prefixes:
+                start = time.perf_counter()
+                sorted(manager.search(prefix), key=lambda c: c.name.lower())[:10]
+                scan = time.perf_counter() - start
+                start = time.perf_counter()
+                hits = manager.autocomplete(prefix, 10)
+                indexed = time.perf_counter() - start
+                print(f"{prefix!r:>12}: {len(hits):>2} hits, search {scan * 1e3:7.1f} ms, "
+                      f"autocomplete {indexed * 1e3:.3f} ms")
+
+
+def bench_query(n=200_000, queries=('name^="Person 123" and address~"main"', 'email="person7@mail.com"',
+                                    'phone>="9000199000" and address~"street"', 'address^="1999"')):
+    """Planned query() against filtering every contact with the same predicates"""
+    print("=== query ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ContactManager(os.path.join(tmpdir, "contacts.json"))
+        manager.add_contacts(make_rows(n))
+        # The planner only uses indexes that exist: build the sorted views and trigram index
+        for by in ("name", "phone", "email"):
+            manager.page(by, limit=1)
+        manager.search("main")
+        for text in queries:
+            predicates = parse_query(text)
+            start = time.perf_counter()
+            [c for c in manager.contacts if all(matches(c, p) for p in predicates)]
+            scan = time.perf_counter() - start
+            start = time.perf_counter()
+            result = manager.query(text)
+            hits = list(result)
+            planned = time.perf_counter() - start
+            plan = result.explain().split("\n")[0]
+            print(f"{text}\n    {len(hits)} hits, scan {scan * 1e3:.1f} ms, "
+                  f"query {planned * 1e3:.3f} ms via {plan}")
+
+
+def bench_external_import(n=300_000, budget=16 * 1024 * 1024):
+    """dedupe_csv on a feed with 5% duplicates: time and peak traced memory"""
+    print("=== external dedupe import ===")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "feed.csv")
+        with open(source, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "phone", "email", "address"])
+            for i in range(n):
+                j = i - 1001 if i % 20 == 0 and i > 1000 else i  # every 20th row repeats an earlier phone
+                writer.writerow([f"Person {i}", f"{9000000000 + j}", f"person{i}@mail.com", f"{i} Main Street"])
+        output = os.path.join(tmpdir, "clean.json")
+        tracemalloc.start()
+        start = time.perf_counter()
+        stats = dedupe_csv(source, output, memory_budget=budget, tmpdir=tmpdir)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{n} rows, budget {budget / 1e6:.0f} MB: {elapsed:.1f}s, peak {peak / 1e6:.1f} MB, {stats}")
+
+
+class LockedContactManager:
+    """The alternative to versions: one lock around every read and write"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.lock = threading.Lock()
+
+    def find_contact(self, keyword):
+        with self.lock:
+            return self.manager.find_contact(keyword)
+
+    def add_contact(self, contact):
+        with self.lock:
+            self.manager.add_contact(contact)
+
+
+def bench_concurrent_reads(n=100_000, readers=4, seconds=2.0):
+    """find_contact throughput of reader threads while a writer keeps adding"""
+    print("=== concurrent reads ===")
+    keys = [f"person{i}@mail.com" for i in random.Random(3).sample(range(n), 1000)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, wrap in (("global lock", LockedContactManager), ("versions", VersionedContactManager)):
+            manager = ContactManager(os.path.join(tmpdir, f"{label}.json"), journal=True)
+            manager.add_contacts(make_rows(n))
+            book = wrap(manager)
+            stop = threading.Event()
+            reads = [0] * readers
+            writes = 0
+
+            def read(slot):
+                count = 0
+                while not stop.is_set():
+                    for key in keys:
+                        book.find_contact(key)
+                    count += len(keys)
+                reads[slot] = count
+
+            def write():
+                nonlocal writes
+                while not stop.is_set():
+                    book.add_contact(Contact("New", f"{8000000000 + writes}", f"new{writes}@mail.com"))
+                    writes += 1
+
+            threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+            threads.append(threading.Thread(target=write))
+            for thread in threads:
+                thread.start()
+            time.sleep(seconds)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            manager.storage.wait()
+            print(f"{label:>12}: {sum(reads) / seconds:>10,.0f} reads/s, {writes / seconds:,.0f} writes/s")
+
+
+if __name__ == "__main__":
+    bench_import()
+    bench_single_add()
+    bench_search()
+    bench_load()
+    bench_backup()
+    bench_validate()
+    bench_memory()
+    bench_duplicates()
+    bench_startup()
+    bench_export()
+    bench_autocomplete()
+    bench_query()
+    bench_external_import()
+    bench_concurrent_reads()
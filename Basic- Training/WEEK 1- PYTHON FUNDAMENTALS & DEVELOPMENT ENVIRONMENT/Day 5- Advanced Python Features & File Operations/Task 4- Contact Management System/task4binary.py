@@ -0,0 +1,170 @@
+import hashlib
+import mmap
+import os
+import struct
+
+MAGIC = b"CTB1"
+VERSION = 2
+# magic, version, count, source size, source mtime_ns, source digest, text offset, phone index, email index
+HEADER = struct.Struct("<4sIQQQ16sQQQ")
+PREAMBLE = struct.Struct("<4sI")  # magic and version, laid out the same in every version
+# text offset, text byte length, then the character length of each of the four fields
+RECORD = struct.Struct("<QIIIII")
+RECORD_ID = struct.Struct("<I")
+
+
+def _text(value):
+    return value if type(value) is str else "" if value is None else str(value)
+
+
+def source_digest(path, chunk_size=1 << 20):
+    """blake2b digest of a file's contents, as stored in snapshot headers"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def write_binary_snapshot(path, rows, source=None):
+    """Write (name, phone, email, address) rows as a binary snapshot.
+
+    Layout: a fixed header, a fixed-size record table (text offset, byte
+    length and per-field character lengths), the packed UTF-8 text of all
+    records, then record ids sorted by phone and by email for binary-search
+    lookups. `source` is the path of the JSON file this snapshot mirrors;
+    its size, mtime and content digest are recorded so readers can tell
+    when it has gone stale.
+    """
+    table = []
+    texts = []
+    phones = []
+    emails = []
+    text_size = 0
+    for row in rows:
+        fields = [_text(value) for value in row]
+        data = "".join(fields).encode("utf-8")
+        table.append((text_size, len(data), *map(len, fields)))
+        texts.append(data)
+        phones.append(fields[1])
+        emails.append(fields[2])
+        text_size += len(data)
+    count = len(table)
+    text_start = HEADER.size + RECORD.size * count
+    phone_index = text_start + text_size
+    email_index = phone_index + RECORD_ID.size * count
+
+    if source:
+        stat = os.stat(source)
+        size, mtime, digest = stat.st_size, stat.st_mtime_ns, source_digest(source)
+    else:
+        size, mtime, digest = 0, 0, bytes(16)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, count, size, mtime, digest, text_start, phone_index, email_index))
+        f.write(b"".join(RECORD.pack(text_start + offset, *rest) for offset, *rest in table))
+        f.write(b"".join(texts))
+        for keys in (phones, emails):
+            order = sorted(range(count), key=keys.__getitem__)
+            f.write(b"".join(RECORD_ID.pack(i) for i in order))
+    os.replace(tmp_path, path)
+
+
+def _split(text, a, b, c):
+    return text[:a], text[a:a + b], text[a + b:a + b + c], text[a + b + c:]
+
+
+class BinarySnapshot:
+    """Read-only, memory-mapped view of a binary snapshot.
+
+    Opening costs O(1): only the header is parsed. Records are decoded on
+    access, and find() binary-searches the phone and email indexes without
+    loading anything else.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = PREAMBLE.unpack_from(self._map, 0) if len(self._map) >= HEADER.size else (None, None)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a contact snapshot")
+        (_, _, self.count, self.source_size, self.source_mtime, self.source_digest,
+         self._text, self._phone_index, self._email_index) = HEADER.unpack_from(self._map, 0)
+
+    def matches(self, source):
+        """True if this snapshot was written from the file at `source`.
+
+        Size and mtime rule out most stale files cheaply; the content digest
+        catches rewrites that kept both.
+        """
+        stat = os.stat(source)
+        if (self.source_size, self.source_mtime) != (stat.st_size, stat.st_mtime_ns):
+            return False
+        return source_digest(source) == self.source_digest
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not -self.count <= i < self.count:
+            raise IndexError("snapshot index out of range")
+        offset, length, a, b, c, _ = RECORD.unpack_from(self._map, HEADER.size + RECORD.size * (i % self.count))
+        return _split(self._map[offset:offset + length].decode("utf-8"), a, b, c)
+
+    def __iter__(self):
+        data = self._map
+        for offset, length, a, b, c, _ in RECORD.iter_unpack(data[HEADER.size:self._text]):
+            yield _split(data[offset:offset + length].decode("utf-8"), a, b, c)
+
+    def _lookup(self, index_start, field, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = RECORD_ID.unpack_from(self._map, index_start + RECORD_ID.size * mid)[0]
+            row = self[record]
+            if row[field] < key:
+                lo = mid + 1
+            elif row[field] > key:
+                hi = mid
+            else:
+                return row
+        return None
+
+    def find(self, keyword):
+        """Row whose phone or email equals keyword, or None"""
+        return self._lookup(self._phone_index, 1, keyword) or self._lookup(self._email_index, 2, keyword)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class SnapshotContactView:
+    """Read-only stand-in for ContactManager.contacts backed by a snapshot;
+    each record becomes a contact only when it is read."""
+
+    def __init__(self, snapshot, factory):
+        self.snapshot = snapshot
+        self.factory = factory
+
+    def __iter__(self):
+        factory = self.factory
+        for row in self.snapshot:
+            yield factory(*row)
+
+    def __getitem__(self, i):
+        return self.factory(*self.snapshot[i])
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def __bool__(self):
+        return len(self) > 0
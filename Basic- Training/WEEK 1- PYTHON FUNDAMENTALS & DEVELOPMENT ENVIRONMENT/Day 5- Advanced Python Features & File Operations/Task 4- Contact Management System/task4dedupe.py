@@ -0,0 +1,98 @@
+import random
+import re
+import zlib
+
+_NON_DIGITS = re.compile(r"\D")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_phone(phone):
+    """Digits only, national part only: '+91 12345 67890' -> '1234567890'"""
+    return _NON_DIGITS.sub("", phone)[-10:]
+
+
+def normalize_text(text):
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def shingles(contact, size=3):
+    """Character shingles of the normalized name and address"""
+    text = normalize_text(contact.name) + "|" + normalize_text(contact.address)
+    if len(text) < size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class DuplicateFinder:
+    """Clusters likely duplicate contacts without comparing every pair.
+
+    Contacts land in the same block when they share a normalized phone, or
+    when MinHash/LSH over their name+address shingles puts them in
+    the same band bucket. Phone blocks are duplicates outright; every pair
+    of LSH candidates in a bucket is confirmed by real Jaccard similarity.
+    Matches are merged into clusters with union-find, so the work grows
+    with the number of contacts and candidate pairs, not with n^2.
+    Shingles are hashed with crc32, so a seed gives the same result in
+    every process, whatever PYTHONHASHSEED is.
+    """
+
+    def __init__(self, threshold=0.8, bands=4, rows=4, seed=42):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(seed)
+        self.masks = [rng.getrandbits(32) for _ in range(bands * rows)]
+
+    def signature(self, grams):
+        hashes = [zlib.crc32(g.encode()) for g in grams]
+        return [min(map(mask.__xor__, hashes)) for mask in self.masks]
+
+    def clusters(self, contacts):
+        """Lists of contacts (2 or more each) that look like the same person"""
+        contacts = list(contacts)
+        parent = list(range(len(contacts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        phones = {}
+        buckets = {}
+        rows = self.rows
+        for i, contact in enumerate(contacts):
+            first = phones.setdefault(normalize_phone(contact.phone), i)
+            if first != i:
+                union(first, i)
+            signature = self.signature(shingles(contact))
+            for band in range(self.bands):
+                key = (band, *signature[band * rows:(band + 1) * rows])
+                buckets.setdefault(key, []).append(i)
+
+        cache = {}
+
+        def grams(i):
+            if i not in cache:
+                cache[i] = shingles(contacts[i])
+            return cache[i]
+
+        for members in buckets.values():
+            for a, i in enumerate(members):
+                for j in members[a + 1:]:
+                    if find(i) != find(j) and jaccard(grams(i), grams(j)) >= self.threshold:
+                        union(i, j)
+
+        groups = {}
+        for i in range(len(contacts)):
+            groups.setdefault(find(i), []).append(contacts[i])
+        return [group for group in groups.values() if len(group) > 1]
@@ -0,0 +1,101 @@
+import csv
+import gzip
+import io
+import lzma
+import os
+from itertools import chain, islice
+from task4storage import FIELDS, iter_json_records, iter_ndjson_records
+
+BUFFER_SIZE = 1024 * 1024
+FORMATS = {".csv": "csv", ".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+COMPRESSIONS = {".gz": "gzip", ".xz": "lzma", ".lzma": "lzma"}
+
+
+def iter_csv_records(rows, batch_size=1024):
+    """CSV text (header first) for field tuples, in pieces of `batch_size` rows"""
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf)
+    writer.writerow(FIELDS)
+    rows = iter(rows)
+    while True:
+        writer.writerows(islice(rows, batch_size))
+        text = buf.getvalue()
+        if not text:
+            return
+        yield text
+        buf.seek(0)
+        buf.truncate()
+
+
+def iter_export(rows, fmt="csv", batch_size=1024):
+    """Stream field tuples as csv, json or ndjson text, one piece per batch.
+
+    Memory holds one batch of rows at a time, so the pieces can be written
+    to a file, a socket or an HTTP response of any size.
+    """
+    if fmt == "csv":
+        return iter_csv_records(rows, batch_size)
+    if fmt == "json":
+        return iter_json_records(rows, batch_size)
+    if fmt == "ndjson":
+        return iter_ndjson_records(rows, batch_size)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_format(path):
+    """(format, compression) implied by a file name, e.g. 'a.ndjson.gz' -> ('ndjson', 'gzip')"""
+    root, ext = os.path.splitext(path.lower())
+    compression = COMPRESSIONS.get(ext)
+    if compression:
+        root, ext = os.path.splitext(root)
+    return FORMATS.get(ext, "csv"), compression
+
+
+def open_export(path, compression=None, buffer_size=BUFFER_SIZE):
+    """Text file for writing `path` through a `buffer_size` byte buffer.
+
+    compression is None, "gzip" or "lzma"; the buffer sits in front of the
+    compressor, so it is fed large blocks instead of one per write.
+    """
+    if compression is None:
+        return open(path, "w", encoding="utf-8", newline="", buffering=buffer_size)
+    if compression == "gzip":
+        raw = gzip.GzipFile(path, "wb", compresslevel=6)
+    elif compression == "lzma":
+        raw = lzma.LZMAFile(path, "wb", preset=1)
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+    return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size), encoding="utf-8", newline="")
+
+
+def part_path(path, number):
+    """'out/contacts.csv.gz', 2 -> 'out/contacts-0002.csv.gz'"""
+    directory, name = os.path.split(path)
+    stem, dot, suffixes = name.partition(".")
+    return os.path.join(directory, f"{stem}-{number:04}{dot}{suffixes}")
+
+
+def export_rows(rows, path, fmt=None, compression=None, rows_per_file=None, buffer_size=BUFFER_SIZE):
+    """Write field tuples to `path`; returns the list of files written.
+
+    fmt and compression default to what the file name implies (see
+    export_format). With rows_per_file the output is split into numbered
+    files (see part_path) of at most that many rows, each complete on its
+    own: every CSV part has a header and every JSON part is a full array.
+    """
+    guessed_fmt, guessed_compression = export_format(path)
+    fmt = fmt or guessed_fmt
+    compression = compression or guessed_compression
+    if not rows_per_file:
+        with open_export(path, compression, buffer_size) as f:
+            f.writelines(iter_export(rows, fmt))
+        return [path]
+    rows = iter(rows)
+    paths = []
+    for first in rows:
+        paths.append(part_path(path, len(paths) + 1))
+        with open_export(paths[-1], compression, buffer_size) as f:
+            f.writelines(iter_export(chain([first], islice(rows, rows_per_file - 1)), fmt))
+    if not paths:
+        return export_rows((), part_path(path, 1), fmt, compression)
+    return paths
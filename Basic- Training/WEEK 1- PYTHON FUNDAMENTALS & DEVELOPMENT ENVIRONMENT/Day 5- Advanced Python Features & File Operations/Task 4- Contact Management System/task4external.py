@@ -0,0 +1,278 @@
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from itertools import count, zip_longest
+from task4storage import write_json_records
+from task4validation import validate_record
+
+ImportStats = namedtuple("ImportStats", "rows written invalid duplicates runs")
+
+LINE_OVERHEAD = 57  # bytes a buffered str costs beyond its characters, list slot included
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    `key in bloom` is never False for a key that was added, and is True
+    for a key that was not with a probability that grows as it fills up.
+    """
+
+    def __init__(self, size_bytes, hashes=4):
+        self.bits = bytearray(max(size_bytes, 1))
+        self.size = len(self.bits) * 8
+        self.hashes = hashes
+
+    def _positions(self, key):
+        h1 = hash(key)
+        h2 = hash(key + "\0") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        bits = self.bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class RunWriter:
+    """External sort of text lines within a memory budget.
+
+    Lines are buffered until `budget` bytes, then sorted and spilled to a
+    run file in `directory`. merged() k-way merges the runs (at most
+    `fan_in` files open at once) with whatever is still buffered.
+    """
+
+    def __init__(self, directory, budget, fan_in=64):
+        self.directory = directory
+        self.budget = budget
+        self.fan_in = fan_in
+        self.lines = []
+        self.size = 0
+        self.paths = []
+        self.spilled = 0
+
+    def add(self, line):
+        self.lines.append(line)
+        self.size += len(line) + LINE_OVERHEAD
+        if self.size >= self.budget:
+            self._spill(sorted(self.lines))
+            self.lines = []
+            self.size = 0
+
+    def _spill(self, lines):
+        fd, path = tempfile.mkstemp(suffix=".run", dir=self.directory)
+        with open(fd, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        self.paths.append(path)
+        self.spilled += 1
+
+    def _merge_files(self, paths, extra=()):
+        files = [open(path, encoding="utf-8") for path in paths]
+        try:
+            yield from heapq.merge(*files, extra)
+        finally:
+            for f in files:
+                f.close()
+            for path in paths:
+                os.remove(path)
+
+    def merged(self):
+        """Every line added, in sorted order"""
+        while len(self.paths) > self.fan_in:
+            batch, self.paths = self.paths[:self.fan_in], self.paths[self.fan_in:]
+            self._spill(self._merge_files(batch))
+        self.lines.sort()
+        paths, lines, self.paths, self.lines = self.paths, self.lines, [], []
+        return self._merge_files(paths, lines)
+
+
+def _seq(seq):
+    return f"{seq:012d}"  # zero-padded so text order is numeric order
+
+
+def dedupe_csv(source, output, memory_budget=64 * 1024 * 1024, tmpdir=None, rejects=None):
+    """Validate and deduplicate a CSV of any size into a contacts JSON file.
+
+    A row is kept when it is valid and no earlier kept row has its phone
+    or its email, so the first occurrence of each key wins and a row that
+    was dropped claims nothing: the same rows add_contacts would keep. The
+    output is in input order and loads with ContactManager.
+
+    Memory stays within about `memory_budget` bytes whatever the input
+    size: a Bloom filter sends rows whose keys were never seen straight to
+    the output without sorting them; only keys that might repeat are
+    spilled as sorted runs to `tmpdir` and k-way merged to find the
+    duplicates. Which rows are kept can depend on earlier drops (A keeps
+    a phone from B, so C may keep the email B had), so that merge repeats
+    until the set of dropped rows stops changing, once per link of the
+    longest such chain; usually two or three rounds. Rejected rows are
+    counted and, if `rejects` is given, written to that CSV file as (file
+    line, reason): invalid rows first, then duplicates with the key they
+    lost on. Returns ImportStats.
+    """
+    work = tempfile.mkdtemp(prefix="contacts-import-", dir=tmpdir)
+    try:
+        return _dedupe(source, output, memory_budget, work, rejects)
+    finally:
+        shutil.rmtree(work)
+
+
+def _iter_seqs(path):
+    """(seq, key) pairs of a seq-ordered drop file, then an endless (None, None)"""
+    if path is not None:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                seq, key = line.rstrip("\n").split("\t", 1)
+                yield seq, key
+    while True:
+        yield None, None
+
+
+def _drop_round(contested, dropped_path, work, budget, round_number):
+    """One round: drop every contested row that an earlier live row beats on a key.
+
+    `contested` holds "seq\tkey" lines in seq order; rows listed in
+    dropped_path (the previous round's answer) do not count as live.
+    Returns (path of the new seq-ordered drop file, runs spilled).
+    """
+    by_key = RunWriter(work, budget)
+    drops = _iter_seqs(dropped_path)
+    next_drop, _ = next(drops)
+    with open(contested, encoding="utf-8") as lines:
+        for line in lines:
+            seq, key = line.rstrip("\n").split("\t", 1)
+            while next_drop is not None and next_drop < seq:
+                next_drop, _ = next(drops)
+            # "\t" sorts before any key character, so each key's lines stay together, in seq order
+            by_key.add(f"{key}\t{seq}\t{int(seq != next_drop)}\n")
+    beaten = RunWriter(work, budget)
+    previous = None
+    claimed = False
+    for line in by_key.merged():
+        key, seq, live = line.rstrip("\n").split("\t")
+        if key != previous:
+            previous, claimed = key, False
+        if claimed:
+            beaten.add(f"{seq}\t{key}\n")
+        elif live == "1":
+            claimed = True
+    path = os.path.join(work, f"dropped-{round_number}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        last = None
+        for line in beaten.merged():
+            seq = line.split("\t", 1)[0]
+            if seq != last:  # beaten on both keys: listed once
+                f.write(line)
+                last = seq
+    return path, by_key.spilled + beaten.spilled
+
+
+def _same_seqs(a, b):
+    if a is None:
+        return False
+    with open(a, encoding="utf-8") as fa, open(b, encoding="utf-8") as fb:
+        return all(x.split("\t", 1)[0] == y.split("\t", 1)[0]
+                   for x, y in zip_longest(fa, fb, fillvalue=""))
+
+
+def _dedupe(source, output, memory_budget, work, rejects):
+    seen = BloomFilter(memory_budget // 8)
+    repeated = BloomFilter(memory_budget // 8)  # keys of rows that hit `seen`
+    rows_path = os.path.join(work, "rows.csv")
+    suspect_path = os.path.join(work, "suspect-keys.txt")
+    earlier_path = os.path.join(work, "earlier-keys.txt")
+    total = invalid = seq = 0
+    reject_file = open(rejects, "w", newline="", encoding="utf-8") if rejects else None
+    try:
+        reject_writer = csv.writer(reject_file) if reject_file else None
+        # Pass 1: validate, keep valid rows in order, note the keys that may repeat
+        with open(source, newline="", encoding="utf-8") as src, \
+                open(rows_path, "w", newline="", encoding="utf-8") as rows_file, \
+                open(suspect_path, "w", encoding="utf-8") as suspect_keys:
+            writer = csv.writer(rows_file)
+            reader = csv.DictReader(src)
+            for row in reader:
+                total += 1
+                try:
+                    name, phone, email, address = validate_record(**row)
+                except (TypeError, ValueError, AttributeError) as e:
+                    invalid += 1
+                    if reject_writer:
+                        reject_writer.writerow((reader.line_num, str(e)))
+                    continue
+                phone_key, email_key = "p" + phone, "e" + email
+                suspect = phone_key in seen or email_key in seen
+                seen.add(phone_key)
+                seen.add(email_key)
+                if suspect:
+                    repeated.add(phone_key)
+                    repeated.add(email_key)
+                    suspect_keys.write(f"{_seq(seq)}\t{phone_key}\n{_seq(seq)}\t{email_key}\n")
+                writer.writerow((int(suspect), reader.line_num, name, phone, email, address))
+                seq += 1
+        del seen
+
+        # Pass 2: earlier first occurrences of the repeated keys
+        with open(rows_path, newline="", encoding="utf-8") as rows_file, \
+                open(earlier_path, "w", encoding="utf-8") as earlier_keys:
+            for seq, (suspect, _, _, phone, email, _) in enumerate(csv.reader(rows_file)):
+                if suspect == "0":
+                    for key in ("p" + phone, "e" + email):
+                        if key in repeated:
+                            earlier_keys.write(f"{_seq(seq)}\t{key}\n")
+        del repeated
+        contested = os.path.join(work, "contested-keys.txt")
+        with open(suspect_path, encoding="utf-8") as a, open(earlier_path, encoding="utf-8") as b, \
+                open(contested, "w", encoding="utf-8") as f:
+            f.writelines(heapq.merge(a, b))
+        os.remove(suspect_path)
+        os.remove(earlier_path)
+
+        # Merge rounds until the dropped rows are stable
+        dropped = None
+        runs = 0
+        for round_number in count(1):
+            path, spilled = _drop_round(contested, dropped, work, memory_budget // 2, round_number)
+            runs += spilled
+            stable = _same_seqs(dropped, path)
+            if dropped is not None:
+                os.remove(dropped)
+            dropped = path
+            if stable:
+                break
+
+        # Pass 3: write the rows that were not dropped, in input order
+        written = duplicates = 0
+
+        def survivors():
+            nonlocal written, duplicates
+            drops = _iter_seqs(dropped)
+            next_drop, lost_on = next(drops)
+            with open(rows_path, newline="", encoding="utf-8") as rows_file:
+                for seq, (_, line, name, phone, email, address) in enumerate(csv.reader(rows_file)):
+                    if next_drop is not None and int(next_drop) == seq:
+                        duplicates += 1
+                        if reject_writer:
+                            field = "phone" if lost_on[0] == "p" else "email"
+                            reject_writer.writerow((line, f"Duplicate {field}: {lost_on[1:]}"))
+                        next_drop, lost_on = next(drops)
+                        continue
+                    written += 1
+                    yield name, phone, email, address
+
+        tmp_path = output + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            write_json_records(f, survivors())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output)
+    finally:
+        if reject_file:
+            reject_file.close()
+    return ImportStats(total, written, invalid, duplicates, runs)
@@ -0,0 +1,164 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+QUERY_FIELDS = ("name", "phone", "email", "address")
+SORTED_FIELDS = ("name", "phone", "email")  # fields ContactManager keeps sorted views for
+HASHED_FIELDS = ("phone", "email")
+RANGE_OPS = ("=", "^=", "<", "<=", ">", ">=")
+_MAX = "\U0010ffff"  # sorts after any character a contact field can hold
+
+Predicate = namedtuple("Predicate", "field op value")
+
+_PREDICATE = re.compile(r'\s*(\w+)\s*(\^=|<=|>=|=|<|>|~)\s*"((?:[^"\\]|\\.)*)"\s*')
+_AND = re.compile(r"and\b\s*", re.IGNORECASE)
+_ESCAPE = re.compile(r"\\(.)")
+
+
+def parse_query(text):
+    """Parse 'name^="Aj" and address~"street"' into a list of Predicates.
+
+    Operators: = (equal), ^= (starts with), ~ (contains, case-insensitive)
+    and < <= > >=. Values are double-quoted; \\" and \\\\ escape inside them.
+    Predicates are combined with `and`.
+    """
+    predicates = []
+    pos = 0
+    while True:
+        match = _PREDICATE.match(text, pos)
+        if match is None:
+            raise ValueError(f"Expected field op \"value\" at position {pos}: {text[pos:]!r}")
+        field, op, value = match.groups()
+        field = field.lower()
+        if field not in QUERY_FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        predicates.append(Predicate(field, op, _ESCAPE.sub(r"\1", value)))
+        pos = match.end()
+        if pos == len(text):
+            return predicates
+        match = _AND.match(text, pos)
+        if match is None:
+            raise ValueError(f"Expected 'and' at position {pos}: {text[pos:]!r}")
+        pos = match.end()
+
+
+def matches(contact, predicate):
+    field, op, value = predicate
+    actual = getattr(contact, field)
+    if op == "=":
+        return actual == value
+    if op == "^=":
+        return actual.startswith(value)
+    if op == "~":
+        return value.lower() in actual.lower()
+    if op == "<":
+        return actual < value
+    if op == "<=":
+        return actual <= value
+    if op == ">":
+        return actual > value
+    return actual >= value
+
+
+def key_range(keys, op, value):
+    """Slice of a SortedView's (value, phone) keys matching `op value`"""
+    if op == "=":
+        return bisect_left(keys, (value,)), bisect_right(keys, (value, _MAX))
+    if op == "^=":
+        return bisect_left(keys, (value,)), bisect_left(keys, (value + _MAX,))
+    if op == "<":
+        return 0, bisect_left(keys, (value,))
+    if op == "<=":
+        return 0, bisect_right(keys, (value, _MAX))
+    if op == ">":
+        return bisect_right(keys, (value, _MAX)), len(keys)
+    return bisect_left(keys, (value,)), len(keys)
+
+
+def _describe(predicate):
+    return f"{predicate.field} {predicate.op} {predicate.value!r}"
+
+
+class ContactQuery:
+    """Planned query over an in-memory ContactManager; iterate for results.
+
+    Each predicate is costed against the access paths the manager has: the
+    phone/email hash maps for equality, the sorted views for equality,
+    prefix and range on name/phone/email, and the trigram index for `~`.
+    Only indexes that already exist are considered (sorted views are built
+    by sorted_contacts/page, the trigram index by search): planning never
+    builds one, since every later add and remove would pay to maintain it.
+    The cheapest path drives the query and the remaining predicates filter
+    its output; a full scan is used when no predicate has an index.
+    Results come lazily, in the driving index's order (list order for the
+    trigram index and scans). explain() describes the chosen plan.
+    """
+
+    def __init__(self, manager, predicates):
+        self.manager = manager
+        self.predicates = predicates
+        self._plan()
+
+    def _access_paths(self, predicate):
+        """(cost, description, source) for each index that can answer predicate;
+        source() iterates the contacts the index selects"""
+        manager = self.manager
+        field, op, value = predicate
+        if op == "=" and field in HASHED_FIELDS:
+            index = manager._by_phone if field == "phone" else manager._by_email
+            contact = index.get(value)
+            yield 1, f"hash lookup: {_describe(predicate)}", lambda: iter([contact] if contact else [])
+        view = manager._sorted_views.get(field) if op in RANGE_OPS and field in SORTED_FIELDS else None
+        if view is not None:
+            lo, hi = key_range(view.keys, op, value)
+            yield (hi - lo, f"sorted view range: {_describe(predicate)} ({hi - lo} entries)",
+                   lambda: map(view.items.__getitem__, range(lo, hi)))
+        if op == "~" and len(value) >= 3 and manager._trigrams is not None:
+            hits = manager._trigrams.candidates(value.lower(), max(64, len(manager.contacts) // 8))
+            if hits is not None:
+                yield (len(hits), f"trigram index: {_describe(predicate)} ({len(hits)} candidates)",
+                       lambda: iter(sorted(hits, key=manager._order.__getitem__)))
+
+    def _plan(self):
+        best = None
+        for predicate in self.predicates:
+            for cost, description, source in self._access_paths(predicate):
+                if best is None or cost < best[0]:
+                    best = cost, description, source, predicate
+        if best is None:
+            contacts = self.manager.contacts
+            self.steps = [f"full scan: {len(contacts)} contacts"]
+            self._source = lambda: iter(contacts)
+            self.filters = list(self.predicates)
+        else:
+            _, description, self._source, driver = best
+            self.steps = [description]
+            # Trigram candidates may be false positives, so they are checked too
+            self.filters = [p for p in self.predicates if p is not driver or p.op == "~"]
+        self.steps.extend(f"filter: {_describe(p)}" for p in self.filters)
+
+    def explain(self):
+        return "\n".join(self.steps)
+
+    def __iter__(self):
+        filters = self.filters
+        for contact in self._source():
+            if all(matches(contact, p) for p in filters):
+                yield contact
+
+
+class SqlQuery:
+    """The same query run by SQLite; explain() shows SQLite's own plan."""
+
+    def __init__(self, storage, predicates, factory):
+        self.storage = storage
+        self.predicates = predicates
+        self.factory = factory
+
+    def explain(self):
+        return "\n".join(self.storage.explain_query(self.predicates))
+
+    def __iter__(self):
+        factory = self.factory
+        for row in self.storage.query(self.predicates):
+            yield factory(*row)
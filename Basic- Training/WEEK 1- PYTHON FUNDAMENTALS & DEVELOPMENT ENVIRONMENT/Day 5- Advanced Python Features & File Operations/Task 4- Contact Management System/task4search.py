@@ -0,0 +1,162 @@
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+SEARCH_FIELDS = ("name", "phone", "email", "address")
+
+
+def trigrams(text):
+    """All 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from lowercase trigrams to the contacts containing them.
+
+    Trigrams from all searchable fields share one posting set per contact,
+    so candidates() may return false positives; callers verify each match.
+    """
+
+    def __init__(self, contacts=()):
+        self.postings = {}
+        self.rebuild(contacts)
+
+    @staticmethod
+    def _grams(contact):
+        grams = set()
+        for field in SEARCH_FIELDS:
+            grams |= trigrams(getattr(contact, field).lower())
+        return grams
+
+    def add(self, contact):
+        for gram in self._grams(contact):
+            bucket = self.postings.get(gram)
+            if bucket is None:
+                self.postings[gram] = {contact}
+            else:
+                bucket.add(contact)
+
+    def remove(self, contact):
+        for gram in self._grams(contact):
+            bucket = self.postings.get(gram)
+            if bucket is not None:
+                bucket.discard(contact)
+                if not bucket:
+                    del self.postings[gram]
+
+    def rebuild(self, contacts):
+        self.postings = {}
+        for contact in contacts:
+            self.add(contact)
+
+    def candidates(self, needle, max_candidates=None):
+        """Contacts whose fields may contain needle (lowercase, 3+ chars).
+
+        Returns None when even the rarest trigram matches more than
+        max_candidates contacts, i.e. when a plain scan would be cheaper.
+        """
+        buckets = []
+        for gram in trigrams(needle):
+            bucket = self.postings.get(gram)
+            if not bucket:
+                return set()
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        if max_candidates is not None and len(buckets[0]) > max_candidates:
+            return None
+        return buckets[0].intersection(*buckets[1:])
+
+
+class SortedView:
+    """Contacts kept ordered by one field, maintained with bisect.
+
+    Entries are keyed by (field value, phone); phones are unique, so keys
+    are too and ties between equal values have a stable order. Keys double
+    as pagination cursors.
+    """
+
+    def __init__(self, field, contacts=()):
+        self.field = field
+        self.keys = []
+        self.items = []
+        self.rebuild(contacts)
+
+    def key(self, contact):
+        return getattr(contact, self.field), contact.phone
+
+    def add(self, contact):
+        key = self.key(contact)
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.items.insert(i, contact)
+
+    def remove(self, contact):
+        key = self.key(contact)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+            del self.items[i]
+
+    def rebuild(self, contacts):
+        pairs = sorted(((self.key(c), c) for c in contacts), key=itemgetter(0))
+        self.keys = [key for key, _ in pairs]
+        self.items = [c for _, c in pairs]
+
+    def page(self, after=None, limit=50):
+        """Up to `limit` contacts after a cursor; returns (contacts, next cursor)"""
+        start = 0 if after is None else bisect_right(self.keys, after)
+        end = start + limit
+        contacts = self.items[start:end]
+        next_cursor = self.keys[end - 1] if end < len(self.keys) else None
+        return contacts, next_cursor
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over lowercased names and emails.
+
+    Each contact has two entries, (name, phone) and (email, phone), in one
+    sorted key list. Every key starting with a prefix sits in one contiguous
+    run found by bisect, already in sorted order, so complete() reads only
+    the entries it returns.
+    """
+
+    def __init__(self, contacts=()):
+        self.keys = []
+        self.items = []
+        self.rebuild(contacts)
+
+    @staticmethod
+    def entries(contact):
+        return (contact.name.lower(), contact.phone), (contact.email.lower(), contact.phone)
+
+    def add(self, contact):
+        for key in self.entries(contact):
+            i = bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.items.insert(i, contact)
+
+    def remove(self, contact):
+        for key in self.entries(contact):
+            i = bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+                del self.items[i]
+
+    def rebuild(self, contacts):
+        pairs = sorted(((key, c) for c in contacts for key in self.entries(c)), key=itemgetter(0))
+        self.keys = [key for key, _ in pairs]
+        self.items = [c for _, c in pairs]
+
+    def complete(self, prefix, limit=10):
+        """Up to `limit` contacts whose name or email starts with prefix, in key order"""
+        prefix = prefix.lower()
+        keys = self.keys
+        found = []
+        seen = set()
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and len(found) < limit and keys[i][0].startswith(prefix):
+            contact = self.items[i]
+            if contact not in seen:  # name and email may both match
+                seen.add(contact)
+                found.append(contact)
+            i += 1
+        return found
@@ -0,0 +1,621 @@
+import heapq
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from json.encoder import encode_basestring_ascii
+from operator import attrgetter
+from task4binary import BinarySnapshot, write_binary_snapshot
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+FIELDS = ("name", "phone", "email", "address")
+_WHITESPACE = re.compile(r"\s*")
+contact_fields = attrgetter(*FIELDS)
+
+
+def contact_rows(contacts):
+    """(name, phone, email, address) tuples for Contact-like objects"""
+    return map(contact_fields, contacts)
+
+
+def _encode_value(value):
+    return encode_basestring_ascii(value) if type(value) is str else json.dumps(value)
+
+
+def write_json_records(f, rows, batch_size=1024):
+    """Write field tuples as a JSON array of contact objects.
+
+    Produces byte-for-byte what json.dump(dicts, f, indent=4) would, but
+    streams from the tuples without building a dict per row.
+    """
+    f.writelines(iter_json_records(rows, batch_size))
+
+
+def iter_json_records(rows, batch_size=1024):
+    """The text of write_json_records() in pieces of `batch_size` records"""
+    keys = [f'        "{field}": ' for field in FIELDS]
+    parts = []
+    first = True
+    for row in rows:
+        body = ",\n".join([key + _encode_value(value) for key, value in zip(keys, row)])
+        parts.append(("[\n    {\n" if first else ",\n    {\n") + body + "\n    }")
+        first = False
+        if len(parts) >= batch_size:
+            yield "".join(parts)
+            parts = []
+    parts.append("[]" if first else "\n]")
+    yield "".join(parts)
+
+
+def iter_ndjson_records(rows, batch_size=1024):
+    """One json.dumps(contact_dict) line per row, in pieces of `batch_size` lines"""
+    keys = ['{"name": ', ', "phone": ', ', "email": ', ', "address": ']
+    parts = []
+    for row in rows:
+        parts.append("".join([key + _encode_value(value) for key, value in zip(keys, row)]) + "}\n")
+        if len(parts) >= batch_size:
+            yield "".join(parts)
+            parts = []
+    if parts:
+        yield "".join(parts)
+
+
+def iter_json_array(f, chunk_size=64 * 1024):
+    """Yield the items of a top-level JSON array one at a time.
+
+    Reads `f` in chunks, so memory holds one chunk plus the item being
+    decoded rather than the whole document. Raises json.JSONDecodeError on
+    malformed input, possibly after some items were already yielded.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_ws()
+    if buf[pos:pos + 1] != "[":
+        raise json.JSONDecodeError("Expected '['", buf, pos)
+    pos += 1
+    skip_ws()
+    if buf[pos:pos + 1] == "]":
+        return
+    while True:
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            # A value touching the end of the buffer may be cut short
+            if end == len(buf) and not eof:
+                raise json.JSONDecodeError("Incomplete item", buf, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        pos = end
+        yield item
+        skip_ws()
+        sep = buf[pos:pos + 1]
+        if sep == "]":
+            return
+        if sep != ",":
+            raise json.JSONDecodeError("Expected ',' or ']'", buf, pos)
+        pos += 1
+        skip_ws()
+
+
+class JsonStorage:
+    """Stores all contacts as one JSON array; every commit rewrites the file.
+
+    With binary=True every full write also emits `<path>.bin`, a
+    memory-mapped snapshot (task4binary) that load can use instead of
+    parsing and validating the JSON, as long as it still matches the file.
+    """
+
+    def __init__(self, path, binary=False):
+        self.path = path
+        self.binary_path = path + ".bin" if binary else None
+
+    def load(self):
+        """Return the stored contacts as a list of dicts"""
+        return self._read_snapshot()
+
+    def iter_load(self):
+        """Yield the stored contacts one dict at a time"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            yield from iter_json_array(f)
+
+    def save(self, contacts):
+        with open(self.path, "w", encoding="utf-8") as f:
+            write_json_records(f, contact_rows(contacts))
+        self._write_binary(contact_rows(contacts))
+
+    def _write_binary(self, rows):
+        if self.binary_path:
+            write_binary_snapshot(self.binary_path, rows, self.path)
+
+    def open_binary(self):
+        """The binary snapshot, if enabled and in sync with the JSON file"""
+        if not self.binary_path or not os.path.exists(self.binary_path) or not os.path.exists(self.path):
+            return None
+        try:
+            snapshot = BinarySnapshot(self.binary_path)
+        except ValueError:
+            return None  # written by an older version: the next save replaces it
+        if snapshot.matches(self.path):
+            return snapshot
+        snapshot.close()
+        return None
+
+    def commit(self, contacts, changes):
+        """Persist `changes` ([(op, contact), ...]) given the current contacts.
+
+        Returns None, or the merged contact dicts when the stored book had
+        changed underneath and the caller must adopt them.
+        """
+        self.save(contacts)
+
+    def changed(self):
+        """True if someone else has written the store since we last read it"""
+        return False
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+
+
+class JournalStorage(JsonStorage):
+    """Snapshot plus an append-only journal of add/remove records.
+
+    Each commit appends one line per change followed by a commit marker and
+    fsyncs, so a write costs O(changes) rather than O(contacts). Records
+    after the last commit marker (a torn write) are ignored on load. Once
+    the journal grows past `compact_threshold` bytes it is rotated and a
+    background thread folds it into a fresh snapshot. If that fails, the
+    error is raised by the next wait() or commit(); the rotated log is kept,
+    never rotated over, and compaction is retried on the next commit.
+    """
+
+    COMMIT = {"op": "commit"}
+
+    def __init__(self, path, compact_threshold=1024 * 1024, binary=False):
+        super().__init__(path, binary)
+        self.log_path = path + ".log"
+        self.old_log_path = path + ".log.old"
+        self.compact_threshold = compact_threshold
+        self._compactor = None
+        self._compact_error = None
+        self._retry_compact = False  # a rotated log is waiting to be folded in
+
+    def load(self):
+        self.wait()
+        records = {c["phone"]: c for c in self._read_snapshot()}
+        self._retry_compact = os.path.exists(self.old_log_path)
+        # A leftover rotated log means compaction was interrupted; replaying
+        # it again on top of the snapshot is idempotent.
+        for log in (self.old_log_path, self.log_path):
+            self._replay(log, records)
+        return list(records.values())
+
+    def iter_load(self):
+        # Journal replay needs the whole snapshot in hand
+        return iter(self.load())
+
+    def open_binary(self):
+        # The binary file mirrors the snapshot only, not the journal on top
+        self.wait()
+        if os.path.exists(self.log_path) or os.path.exists(self.old_log_path):
+            return None
+        return super().open_binary()
+
+    def save(self, contacts):
+        """Write a full snapshot and truncate the journal"""
+        self.wait()
+        self._write_snapshot(list(contacts))
+        for log in (self.old_log_path, self.log_path):
+            if os.path.exists(log):
+                os.remove(log)
+        self._retry_compact = False
+
+    def commit(self, contacts, changes):
+        if not changes:
+            return
+        self._raise_compact_error()
+        lines = [json.dumps({"op": op, "contact": c.to_dict()}) for op, c in changes]
+        lines.append(json.dumps(self.COMMIT))
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        if size > self.compact_threshold or self._retry_compact:
+            self.compact(contacts)
+
+    def compact(self, contacts):
+        """Rotate the journal and rebuild the snapshot in the background"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._raise_compact_error()
+        self._retry_compact = False
+        if not os.path.exists(self.old_log_path):
+            os.replace(self.log_path, self.old_log_path)
+        # Otherwise an earlier compaction did not finish and its rotated log
+        # is the only durable copy of those changes: retry it first and keep
+        # appending to the current journal meanwhile
+        self._compactor = threading.Thread(
+            target=self._compact, args=(list(contacts),), name="contacts-compactor"
+        )
+        self._compactor.start()
+
+    def wait(self):
+        """Block until a running compaction has finished"""
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        self._raise_compact_error()
+
+    def _raise_compact_error(self):
+        error, self._compact_error = self._compact_error, None
+        if error is not None:
+            raise error
+
+    def _compact(self, contacts):
+        try:
+            self._write_snapshot(contacts)
+            os.remove(self.old_log_path)
+        except Exception as e:
+            self._compact_error = e  # the thread has no caller to raise to
+            self._retry_compact = True
+
+    def _write_snapshot(self, contacts):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            write_json_records(f, contact_rows(contacts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._write_binary(contact_rows(contacts))
+
+    @staticmethod
+    def _replay(log_path, records):
+        if not os.path.exists(log_path):
+            return
+        pending = []
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn tail from a crash mid-append
+                if entry["op"] != "commit":
+                    pending.append(entry)
+                    continue
+                for change in pending:
+                    contact = change["contact"]
+                    if change["op"] == "add":
+                        records[contact["phone"]] = contact
+                    else:
+                        records.pop(contact["phone"], None)
+                pending = []
+
+
+class MergeConflict(ValueError):
+    """A commit lost to another writer's change; `records` is the stored book it lost to"""
+
+    def __init__(self, message, records):
+        super().__init__(message)
+        self.records = records
+
+
+class SharedJsonStorage(JsonStorage):
+    """JSON storage that several processes can use at once.
+
+    Writers hold an exclusive fcntl lock on `<path>.lock`, which also holds
+    a generation counter bumped by every write; readers take a shared lock.
+    A commit from a process whose generation is out of date re-reads the
+    file and replays its own changes on top instead of overwriting the
+    other writer's. If one of its adds now collides with a stored phone or
+    email, nothing is written and MergeConflict is raised with the stored
+    records. The JSON file is replaced atomically, so even unlocked readers
+    never see a partial write.
+    """
+
+    def __init__(self, path, binary=False):
+        if fcntl is None:
+            raise RuntimeError("Shared storage needs fcntl (POSIX only)")
+        super().__init__(path, binary)
+        self.lock_path = path + ".lock"
+        self.generation = None
+
+    @contextmanager
+    def _locked(self, operation):
+        with open(self.lock_path, "a+", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield lock_file
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_generation(lock_file):
+        lock_file.seek(0)
+        text = lock_file.read().strip()
+        return int(text) if text else 0
+
+    def current_generation(self):
+        with self._locked(fcntl.LOCK_SH) as lock_file:
+            return self._read_generation(lock_file)
+
+    def changed(self):
+        return self.current_generation() != self.generation
+
+    def load(self):
+        with self._locked(fcntl.LOCK_SH) as lock_file:
+            self.generation = self._read_generation(lock_file)
+            return self._read_snapshot()
+
+    def iter_load(self):
+        with self._locked(fcntl.LOCK_SH) as lock_file:
+            self.generation = self._read_generation(lock_file)
+            yield from super().iter_load()
+
+    def open_binary(self):
+        with self._locked(fcntl.LOCK_SH) as lock_file:
+            self.generation = self._read_generation(lock_file)
+            return super().open_binary()
+
+    def save(self, contacts):
+        """Write our whole book, deliberately replacing whatever is stored"""
+        with self._locked(fcntl.LOCK_EX) as lock_file:
+            self._write(contact_rows(contacts), lock_file)
+
+    def commit(self, contacts, changes):
+        with self._locked(fcntl.LOCK_EX) as lock_file:
+            generation = self._read_generation(lock_file)
+            if generation == self.generation:
+                self._write(contact_rows(contacts), lock_file)
+                return None
+            stored = self._read_snapshot()
+            try:
+                records = self._merge(stored, changes)
+            except MergeConflict:
+                self.generation = generation  # the caller adopts what it lost to
+                raise
+            self._write([tuple(r.get(field, "") for field in FIELDS) for r in records], lock_file)
+            return records
+
+    def _merge(self, stored, changes):
+        records = {r["phone"]: r for r in stored}
+        emails = {r["email"] for r in stored}
+        for op, contact in changes:
+            if op == "add":
+                if contact.phone in records or contact.email in emails:
+                    raise MergeConflict("Duplicate contact detected", stored)
+                records[contact.phone] = contact.to_dict()
+                emails.add(contact.email)
+            else:
+                removed = records.pop(contact.phone, None)
+                if removed is not None:
+                    emails.discard(removed["email"])
+        return list(records.values())
+
+    def _write(self, rows, lock_file):
+        rows = list(rows)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            write_json_records(f, rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._write_binary(rows)
+        generation = self._read_generation(lock_file) + 1
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{generation}\n")
+        lock_file.flush()
+        self.generation = generation
+
+
+class SqliteStorage:
+    """Contacts kept in a SQLite table instead of in memory.
+
+    Phone and email carry unique indexes, lookups, search and ordering run
+    in SQL, and rows become Contact objects only as they are read. Changes
+    are made inside an open transaction that commit()/rollback() finish.
+    """
+
+    FIELDS = "name, phone, email, address"
+    SORT_KEYS = {"insertion": "id", "name": "name, id", "phone": "phone", "email": "email"}
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # Python's str.lower, so search matches the in-memory semantics exactly
+        self.conn.create_function("pylower", 1, str.lower, deterministic=True)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS contacts (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                email TEXT NOT NULL,
+                address TEXT NOT NULL DEFAULT ''
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS contacts_phone ON contacts (phone);
+            CREATE UNIQUE INDEX IF NOT EXISTS contacts_email ON contacts (email);
+            CREATE INDEX IF NOT EXISTS contacts_name_phone ON contacts (name, phone);
+            CREATE INDEX IF NOT EXISTS contacts_name_nocase ON contacts (name COLLATE NOCASE, phone);
+        """)
+        self.order_by = "insertion"
+
+    def open_binary(self):
+        return None
+
+    def changed(self):
+        return False
+
+    def view(self, factory):
+        return SqliteContactView(self, factory)
+
+    def rows(self, where="", params=(), order_by=None):
+        order = self.SORT_KEYS[order_by or self.order_by]
+        return self.conn.execute(
+            f"SELECT {self.FIELDS} FROM contacts {where} ORDER BY {order}", params
+        )
+
+    def find(self, keyword):
+        return self.conn.execute(
+            f"SELECT {self.FIELDS} FROM contacts WHERE phone = ? OR email = ? LIMIT 1",
+            (keyword, keyword),
+        ).fetchone()
+
+    def search(self, keyword):
+        return self.rows(
+            "WHERE instr(pylower(name), :needle) OR instr(phone, :keyword)"
+            " OR instr(pylower(email), :needle) OR instr(pylower(address), :needle)",
+            {"needle": keyword.lower(), "keyword": keyword},
+        )
+
+    def autocomplete(self, prefix, limit=10):
+        """Rows whose name or email starts with prefix, as ContactManager.autocomplete.
+
+        Two index range scans merged in Python. SQLite's NOCASE folds ASCII
+        letters only, so names with non-ASCII initials need matching case.
+        """
+        prefix = prefix.lower()
+        end = prefix + "\U0010ffff"
+        names = self.conn.execute(
+            f"SELECT {self.FIELDS} FROM contacts WHERE name >= ? COLLATE NOCASE"
+            " AND name < ? COLLATE NOCASE ORDER BY name COLLATE NOCASE, phone LIMIT ?",
+            (prefix, end, limit),
+        )
+        emails = self.conn.execute(
+            f"SELECT {self.FIELDS} FROM contacts WHERE email >= ? AND email < ?"
+            " ORDER BY email LIMIT ?",
+            (prefix, end, limit),
+        )
+        merged = heapq.merge(
+            ((row[0].lower(), row[1], row) for row in names),
+            ((row[2], row[1], row) for row in emails),
+        )
+        found = []
+        seen = set()
+        for _, phone, row in merged:
+            if len(found) == limit:
+                break
+            if phone not in seen:
+                seen.add(phone)
+                found.append(row)
+        return found
+
+    def _where(self, predicates):
+        """WHERE clause for task4query Predicates (fields are whitelisted by the parser)"""
+        clauses = []
+        params = []
+        for field, op, value in predicates:
+            if op == "~":
+                clauses.append(f"instr(pylower({field}), ?)")
+                params.append(value.lower())
+            elif op == "^=":
+                clauses.append(f"{field} >= ? AND {field} < ?")
+                params += [value, value + "\U0010ffff"]
+            else:
+                clauses.append(f"{field} {op} ?")
+                params.append(value)
+        return "WHERE " + " AND ".join(clauses), params
+
+    def query(self, predicates):
+        where, params = self._where(predicates)
+        return self.conn.execute(f"SELECT {self.FIELDS} FROM contacts {where}", params)
+
+    def explain_query(self, predicates):
+        where, params = self._where(predicates)
+        plan = self.conn.execute(f"EXPLAIN QUERY PLAN SELECT {self.FIELDS} FROM contacts {where}", params)
+        return [row[-1] for row in plan]
+
+    def page(self, by, after=None, limit=50):
+        """Keyset pagination on (by, phone); returns (rows, next cursor)"""
+        where, params = "", ()
+        if after is not None:
+            where, params = f"WHERE ({by}, phone) > (?, ?)", tuple(after)
+        rows = self.conn.execute(
+            f"SELECT {self.FIELDS} FROM contacts {where} ORDER BY {by}, phone LIMIT ?",
+            params + (limit + 1,),
+        ).fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        last = rows[limit - 1]
+        return rows[:limit], (last[FIELDS.index(by)], last[1])
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def insert(self, contact):
+        try:
+            self.conn.execute(
+                f"INSERT INTO contacts ({self.FIELDS}) VALUES (?, ?, ?, ?)",
+                (contact.name, contact.phone, contact.email, contact.address),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError("Duplicate contact detected")
+
+    def delete(self, contact):
+        self.conn.execute("DELETE FROM contacts WHERE phone = ?", (contact.phone,))
+
+    def save(self, contacts):
+        self.conn.commit()
+
+    def commit(self, contacts, changes):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+
+class SqliteContactView:
+    """Read-only, lazily materialized stand-in for ContactManager.contacts."""
+
+    def __init__(self, storage, factory):
+        self.storage = storage
+        self.factory = factory
+
+    def __iter__(self):
+        factory = self.factory
+        for row in self.storage.rows():
+            yield factory(*row)
+
+    def __len__(self):
+        return self.storage.count()
+
+    def __bool__(self):
+        return len(self) > 0
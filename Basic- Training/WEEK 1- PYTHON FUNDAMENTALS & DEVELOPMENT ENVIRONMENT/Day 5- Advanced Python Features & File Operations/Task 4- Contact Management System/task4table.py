@@ -0,0 +1,58 @@
+import sys
+from task4storage import write_json_records
+from task4export import iter_csv_records
+
+
+class ContactTable:
+    """Memory-compact, column-wise store of validated contacts.
+
+    Each field lives in its own list, so a contact costs four list slots
+    instead of an object plus its attributes. Names and addresses repeat a
+    lot across a book and are interned; phones and emails are unique, so
+    interning them would only add overhead. Rows come back as tuples in
+    FIELDS order, and the serializers stream straight from the columns.
+    """
+
+    def __init__(self, rows=()):
+        self.names = []
+        self.phones = []
+        self.emails = []
+        self.addresses = []
+        self.extend(rows)
+
+    @classmethod
+    def from_contacts(cls, contacts):
+        table = cls()
+        for c in contacts:
+            table.append(c.name, c.phone, c.email, c.address)
+        return table
+
+    def append(self, name, phone, email, address=""):
+        self.names.append(sys.intern(name))
+        self.phones.append(phone)
+        self.emails.append(email)
+        self.addresses.append(sys.intern(address) if type(address) is str else address)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(*row)
+
+    def __len__(self):
+        return len(self.phones)
+
+    def __getitem__(self, i):
+        return self.names[i], self.phones[i], self.emails[i], self.addresses[i]
+
+    def rows(self):
+        return zip(self.names, self.phones, self.emails, self.addresses)
+
+    def __iter__(self):
+        return self.rows()
+
+    def write_json(self, f):
+        """Same output as ContactManager.save()"""
+        write_json_records(f, self.rows())
+
+    def write_csv(self, f):
+        """Same output as ContactManager.export_to_csv(); open f with newline=\"\""""
+        f.writelines(iter_csv_records(self.rows()))
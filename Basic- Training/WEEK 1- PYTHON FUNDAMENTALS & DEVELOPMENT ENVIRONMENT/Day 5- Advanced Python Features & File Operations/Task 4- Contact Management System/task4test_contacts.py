@@ -0,0 +1,691 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import lzma
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from task4 import Contact, ContactManager, validate_batch, validate_columns
+from task4validation import validate_csv_parallel
+from task4async import AsyncContactManager
+from task4dedupe import DuplicateFinder, jaccard, shingles
+from task4export import export_rows
+from task4external import dedupe_csv
+from task4versions import VersionedContactManager
+from task4query import matches, parse_query
+
+
+def add_shared_contacts(storage, first, count):
+    manager = ContactManager(storage, shared=True)
+    for i in range(first, first + count):
+        manager.add_contact(Contact(f"P{i}", f"{9000000000 + i}", f"p{i}@mail.com"))
+
+class task4test_contacts(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage = os.path.join(self.tmpdir, "contacts.json")
+        self.manager = ContactManager(self.storage)
+        self.ajay = Contact("Ajay", "1234567890", "ajay@mail.com", "Wonderland")
+        self.sanjay = Contact("Sanjay", "1987654321", "sanjay@mail.com", "Builder Street")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_find_contact_by_phone_and_email(self):
+        self.manager.add_contact(self.ajay)
+        self.assertIs(self.manager.find_contact("1234567890"), self.ajay)
+        self.assertIs(self.manager.find_contact("ajay@mail.com"), self.ajay)
+        self.assertIsNone(self.manager.find_contact("0000000000"))
+
+    def test_duplicate_rejected(self):
+        self.manager.add_contact(self.ajay)
+        with self.assertRaises(ValueError):
+            self.manager.add_contact(Contact("Other", "1234567890", "other@mail.com"))
+        with self.assertRaises(ValueError):
+            self.manager.add_contact(Contact("Other", "1111111111", "ajay@mail.com"))
+
+    def test_remove_and_sort_keep_indexes_in_sync(self):
+        self.manager.add_contact(self.sanjay)
+        self.manager.add_contact(self.ajay)
+        self.manager.sort_contacts("name")
+        self.assertIs(self.manager.find_contact("sanjay@mail.com"), self.sanjay)
+        self.assertTrue(self.manager.remove_contact("1234567890"))
+        self.assertIsNone(self.manager.find_contact("ajay@mail.com"))
+        self.manager.add_contact(Contact("Ajay", "1234567890", "ajay@mail.com"))
+
+    def test_load_rebuilds_indexes(self):
+        self.manager.add_contact(self.ajay)
+        reloaded = ContactManager(self.storage)
+        self.assertEqual(reloaded.find_contact("ajay@mail.com").name, "Ajay")
+
+    def test_add_contacts_saves_once_and_reports(self):
+        saves = []
+        original_commit = self.manager.storage.commit
+        self.manager.storage.commit = lambda *args: saves.append(1) or original_commit(*args)
+        report = self.manager.add_contacts([
+            self.ajay.to_dict(),
+            {"name": "Dup", "phone": "1234567890", "email": "dup@mail.com"},
+            {"name": "", "phone": "1112223334", "email": "x@mail.com"},
+            self.sanjay,
+        ])
+        self.assertEqual(report.added, 2)
+        self.assertEqual([row for row, _ in report.rejected], [2, 3])
+        self.assertEqual(len(saves), 1)
+        self.assertEqual(len(ContactManager(self.storage).contacts), 2)
+
+    def test_add_contacts_with_workers_accepts_contacts(self):
+        rows = [self.ajay, {"name": "Dup", "phone": "1234567890", "email": "dup@mail.com"}, self.sanjay]
+        report = self.manager.add_contacts(rows, workers=2)
+        self.assertEqual((report.added, [row for row, _ in report.rejected]), (2, [2]))
+        self.assertEqual([c.to_dict() for c in self.manager.contacts], [self.ajay.to_dict(), self.sanjay.to_dict()])
+
+    def test_batch_rolls_back_on_failure(self):
+        self.manager.add_contact(self.ajay)
+        with self.assertRaises(RuntimeError):
+            with self.manager.batch():
+                self.manager.add_contact(self.sanjay)
+                raise RuntimeError("boom")
+        self.assertEqual(self.manager.contacts, [self.ajay])
+        self.assertIsNone(self.manager.find_contact("sanjay@mail.com"))
+
+    def test_import_from_csv_reports_file_lines(self):
+        source = os.path.join(self.tmpdir, "in.csv")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("name,phone,email,address\n")
+            f.write("Ajay,1234567890,ajay@mail.com,Wonderland\n")
+            f.write("\n")
+            f.write("Bad,123,bad@mail.com,\n")
+        report = self.manager.import_from_csv(source)
+        self.assertEqual(report.added, 1)
+        self.assertEqual(report.rejected, [(4, "Invalid phone number format")])
+        other = ContactManager(os.path.join(self.tmpdir, "other.json"))
+        self.assertEqual(other.import_from_csv(source, workers=2).rejected, report.rejected)
+
+    def test_journal_appends_and_replays(self):
+        manager = ContactManager(self.storage, journal=True)
+        manager.add_contact(self.ajay)
+        manager.add_contact(self.sanjay)
+        manager.remove_contact("1234567890")
+        self.assertFalse(os.path.exists(self.storage))
+        reloaded = ContactManager(self.storage, journal=True)
+        self.assertEqual([c.phone for c in reloaded.contacts], ["1987654321"])
+
+    def test_journal_ignores_torn_tail(self):
+        manager = ContactManager(self.storage, journal=True)
+        manager.add_contact(self.ajay)
+        with open(self.storage + ".log", "a", encoding="utf-8") as f:
+            f.write('{"op": "add", "contact": {"name": "Half"')
+        reloaded = ContactManager(self.storage, journal=True)
+        self.assertEqual([c.phone for c in reloaded.contacts], ["1234567890"])
+
+    def test_journal_compacts_into_snapshot(self):
+        manager = ContactManager(self.storage, journal=True)
+        manager.storage.compact_threshold = 200
+        manager.add_contact(self.ajay)
+        manager.add_contact(self.sanjay)
+        manager.storage.wait()
+        self.assertTrue(os.path.exists(self.storage))
+        self.assertFalse(os.path.exists(self.storage + ".log.old"))
+        manager.remove_contact("1234567890")
+        reloaded = ContactManager(self.storage, journal=True)
+        self.assertEqual([c.phone for c in reloaded.contacts], ["1987654321"])
+
+    def test_journal_reports_failed_compaction(self):
+        manager = ContactManager(self.storage, journal=True)
+        storage = manager.storage
+        storage.compact_threshold = 200
+        write_snapshot = storage._write_snapshot
+
+        def fail(contacts):
+            raise OSError("No space left on device")
+
+        storage._write_snapshot = fail
+        manager.add_contact(self.ajay)
+        manager.add_contact(self.sanjay)
+        with self.assertRaisesRegex(OSError, "No space"):
+            storage.wait()
+        storage._write_snapshot = write_snapshot
+        self.assertTrue(os.path.exists(self.storage + ".log.old"))
+        extra = Contact("Extra", "5550001111", "extra@mail.com")
+        manager.add_contact(extra)  # retries the compaction, keeps the rotated log
+        self.assertTrue(os.path.exists(self.storage + ".log"))
+        storage.wait()
+        self.assertFalse(os.path.exists(self.storage + ".log.old"))
+        reloaded = ContactManager(self.storage, journal=True)
+        self.assertEqual(sorted(c.phone for c in reloaded.contacts), ["1234567890", "1987654321", "5550001111"])
+
+        storage._write_snapshot = fail
+        manager.remove_contact("5550001111")
+        storage._compactor.join()
+        with self.assertRaisesRegex(OSError, "No space"):
+            manager.add_contact(Contact("Late", "5550002222", "late@mail.com"))
+        self.assertIsNone(manager.find_contact("5550002222"))  # reverted, not half-saved
+        storage._write_snapshot = write_snapshot
+
+    def test_search_matches_full_scan(self):
+        self.manager.add_contacts([self.sanjay, self.ajay, Contact("Ajit", "5550001111", "ajit@work.org", "Main STREET")])
+        self.manager.sort_contacts("name")
+        expected = lambda kw: [
+            c for c in self.manager.contacts
+            if kw.lower() in c.name.lower() or kw in c.phone
+            or kw.lower() in c.email.lower() or kw.lower() in c.address.lower()
+        ]
+        for keyword in ["aj", "AJA", "street", "mail.com", "9876", "work", "nobody", ""]:
+            self.assertEqual(self.manager.search(keyword), expected(keyword), keyword)
+        self.manager.remove_contact("1987654321")
+        self.assertEqual(self.manager.search("street"), expected("street"))
+        self.assertEqual([c.name for c in self.manager.search("street")], ["Ajit"])
+
+    def test_sqlite_backend(self):
+        db = os.path.join(self.tmpdir, "contacts.db")
+        manager = ContactManager(db)
+        report = manager.add_contacts([self.sanjay, self.ajay, self.ajay.to_dict()])
+        self.assertEqual((report.added, len(report.rejected)), (2, 1))
+        self.assertEqual(manager.find_contact("ajay@mail.com").name, "Ajay")
+        with self.assertRaises(ValueError):
+            manager.add_contact(Contact("Dup", "1234567890", "new@mail.com"))
+        self.assertEqual([c.name for c in manager.search("STREET")], ["Sanjay"])
+        manager.sort_contacts("name")
+        self.assertEqual([c.name for c in manager.contacts], ["Ajay", "Sanjay"])
+        manager.storage.close()
+
+        reloaded = ContactManager(db)
+        self.assertEqual(len(reloaded.contacts), 2)
+        self.assertTrue(reloaded.remove_contact("1234567890"))
+        csv_file = os.path.join(self.tmpdir, "out.csv")
+        reloaded.export_to_csv(csv_file)
+        other = ContactManager(os.path.join(self.tmpdir, "other.db"))
+        self.assertEqual(other.import_from_csv(csv_file).added, 1)
+
+    def test_sqlite_batch_rollback(self):
+        manager = ContactManager(os.path.join(self.tmpdir, "contacts.db"))
+        manager.add_contact(self.ajay)
+        with self.assertRaises(RuntimeError):
+            with manager.batch():
+                manager.add_contact(self.sanjay)
+                raise RuntimeError("boom")
+        self.assertEqual([c.phone for c in manager.contacts], ["1234567890"])
+
+    def test_lazy_load_serves_lookups(self):
+        rows = [{"name": f"P{i}", "phone": f"{9000000000 + i}", "email": f"p{i}@mail.com"}
+                for i in range(5000)]
+        self.manager.add_contacts(rows)
+        lazy = ContactManager(self.storage, lazy=True)
+        self.assertEqual(lazy.find_contact("p4999@mail.com").phone, "9000004999")
+        self.assertIsNone(lazy.find_contact("missing@mail.com"))
+        lazy.wait_until_loaded()
+        self.assertEqual(len(lazy.contacts), 5000)
+        self.assertEqual(len(lazy.search("p12")), 111)
+
+    def test_load_streams_and_tolerates_bad_json(self):
+        with open(self.storage, "w", encoding="utf-8") as f:
+            f.write('[{"name": "Ajay", "phone": "1234567890", "email": "ajay@mail.com"}, {"name"')
+        self.assertEqual(ContactManager(self.storage).contacts, [])
+
+    def test_incremental_backup_and_restore(self):
+        store = os.path.join(self.tmpdir, "backups")
+        rows = [{"name": f"P{i}", "phone": f"{9000000000 + i}", "email": f"p{i}@mail.com"}
+                for i in range(2000)]
+        self.manager.add_contacts(rows)
+        first_id, first_bytes = self.manager.incremental_backup(store)
+        self.manager.remove_contact("9000000500")
+        self.manager.add_contact(self.ajay)
+        second_id, second_bytes = self.manager.incremental_backup(store)
+        self.assertLess(second_bytes * 10, first_bytes)
+        expected = [c.to_dict() for c in self.manager.contacts]
+
+        self.manager.restore_backup(first_id, store)
+        self.assertEqual(len(self.manager.contacts), 2000)
+        self.assertIsNotNone(self.manager.find_contact("9000000500"))
+        self.manager.restore_backup(second_id, store)
+        self.assertEqual([c.to_dict() for c in ContactManager(self.storage).contacts], expected)
+
+    def test_validate_batch_matches_contact(self):
+        rows = [
+            {"name": " ajay ", "phone": "1234567890", "email": "AJAY@mail.com"},
+            ("Sanjay", "12", "sanjay@mail.com"),
+            ("Sanjay", "1987654321", "sanjay@mail.com", "Builder Street"),
+            {"name": "X", "phone": "1112223334", "email": "x@mail.com", "extra": 1},
+        ] * 3
+        for workers in (None, 2):
+            contacts, errors = validate_batch(rows, workers=workers, chunk_size=2)
+            self.assertEqual([c.to_dict() for c in contacts],
+                             [Contact(" ajay ", "1234567890", "AJAY@mail.com").to_dict(),
+                              self.sanjay.to_dict()] * 3)
+            self.assertEqual([i for i, _ in errors], [1, 3, 5, 7, 9, 11])
+            self.assertEqual(errors[0][1], "Invalid phone number format")
+        contacts, errors = validate_columns(["Ajay", ""], ["1234567890", "1987654321"],
+                                            ["ajay@mail.com", "s@mail.com"])
+        self.assertEqual((len(contacts), errors), (1, [(1, "Name cannot be empty")]))
+
+    def test_import_with_workers_matches_serial(self):
+        source = os.path.join(self.tmpdir, "in.csv")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("name,phone,email,address\n")
+            f.write("Ajay,1234567890,ajay@mail.com,Wonderland\n")
+            f.write("Bad,123,bad@mail.com,\n")
+            f.write("Again,1234567890,again@mail.com,\n")
+            f.write("Sanjay,1987654321,sanjay@mail.com,\n")
+            for i in range(300):
+                f.write(f"P{i},{9000000000 + i % 250},p{i % 270}@mail.com,\n")
+                if i % 50 == 0:
+                    f.write("\n")
+                    f.write("Short,9111111111\n")
+        serial = self.manager.import_from_csv(source)
+        for shards in (1, 3, 64):
+            other = ContactManager(os.path.join(self.tmpdir, f"other{shards}.json"))
+            valid, errors = validate_csv_parallel(source, workers=2, shards=shards)
+            parallel = other._add_validated(valid, errors)
+            self.assertEqual((parallel.added, parallel.rejected), (serial.added, serial.rejected))
+            self.assertEqual([c.to_dict() for c in other.contacts],
+                             [c.to_dict() for c in self.manager.contacts])
+        other = ContactManager(os.path.join(self.tmpdir, "other.json"))
+        self.assertEqual(other.import_from_csv(source, workers=2).rejected, serial.rejected)
+
+    def test_contact_table_serializers_match_manager(self):
+        self.manager.add_contacts([self.ajay, self.sanjay])
+        table = self.manager.to_table()
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table[1], ("Sanjay", "1987654321", "sanjay@mail.com", "Builder Street"))
+        out = io.StringIO()
+        table.write_json(out)
+        with open(self.storage, encoding="utf-8") as f:
+            saved = f.read()
+        self.assertEqual(out.getvalue(), saved)
+        self.assertEqual(saved, json.dumps([self.ajay.to_dict(), self.sanjay.to_dict()], indent=4))
+        csv_file = os.path.join(self.tmpdir, "out.csv")
+        self.manager.export_to_csv(csv_file)
+        out = io.StringIO(newline="")
+        table.write_csv(out)
+        with open(csv_file, encoding="utf-8", newline="") as f:
+            self.assertEqual(out.getvalue(), f.read())
+        self.assertFalse(hasattr(self.ajay, "__dict__"))
+
+    def test_sorted_views_and_pagination(self):
+        for storage in (self.storage, os.path.join(self.tmpdir, "contacts.db")):
+            manager = ContactManager(storage)
+            rows = [{"name": f"N{i % 7}", "phone": f"{9000000000 + i}", "email": f"p{i:03}@mail.com"}
+                    for i in range(100)]
+            manager.add_contacts(rows)
+            manager.remove_contact("9000000003")
+            manager.add_contact(Contact("A", "8000000000", "zz@mail.com"))
+            expected = sorted(manager.contacts, key=lambda c: (c.name, c.phone))
+            self.assertEqual([c.phone for c in manager.sorted_contacts("name")],
+                             [c.phone for c in expected])
+            self.assertEqual(next(iter(manager.contacts)).phone, "9000000000")
+            seen, cursor = [], None
+            while True:
+                page, cursor = manager.page("name", after=cursor, limit=30)
+                seen.extend(c.phone for c in page)
+                if cursor is None:
+                    break
+            self.assertEqual(seen, [c.phone for c in expected])
+            page, _ = manager.page("name", after="N5", limit=100)
+            self.assertEqual({c.name for c in page}, {"N6"})
+            page, _ = manager.page("email", limit=2)
+            self.assertEqual([c.email for c in page], ["p000@mail.com", "p001@mail.com"])
+
+    def test_async_manager_coalesces_concurrent_writes(self):
+        commits = []
+
+        async def worker(book, i):
+            contact = Contact(f"P{i}", f"{9000000000 + i}", f"p{i}@mail.com")
+            await book.add_contact(contact)
+            self.assertTrue(os.path.exists(self.storage))
+            if i % 3 == 0:
+                self.assertTrue(await book.remove_contact(contact.phone))
+
+        async def main():
+            async with await AsyncContactManager.open(self.storage) as book:
+                original = book.manager.storage.commit
+                book.manager.storage.commit = lambda *args: commits.append(1) or original(*args)
+                await asyncio.gather(*(worker(book, i) for i in range(500)))
+                with self.assertRaises(ValueError):
+                    await book.add_contact(Contact("Dup", "9000000001", "x@mail.com"))
+                self.assertEqual(book.find_contact("p1@mail.com").name, "P1")
+
+        asyncio.run(main())
+        self.assertLess(len(commits), 20)
+        reloaded = ContactManager(self.storage)
+        self.assertEqual(len(reloaded.contacts), 500 - 167)
+        self.assertIsNone(reloaded.find_contact("9000000003"))
+
+    def test_async_manager_reverts_failed_writes(self):
+        async def main():
+            async with await AsyncContactManager.open(self.storage) as book:
+                original = book.manager.storage.commit
+                failures = [OSError("disk full")]
+
+                def commit(*args):
+                    if failures:
+                        raise failures.pop()
+                    return original(*args)
+
+                book.manager.storage.commit = commit
+                with self.assertRaises(OSError):
+                    await book.add_contact(self.ajay)
+                self.assertIsNone(book.find_contact(self.ajay.phone))
+                await book.add_contact(self.sanjay)
+
+        asyncio.run(main())
+        self.assertEqual([c.phone for c in ContactManager(self.storage).contacts], [self.sanjay.phone])
+
+    def test_async_manager_close_is_idempotent(self):
+        async def main():
+            async with await AsyncContactManager.open(self.storage) as book:
+                await book.add_contact(self.ajay)
+                await book.close()
+            with self.assertRaises(ValueError):
+                await book.add_contact(self.sanjay)
+            return book.manager
+
+        manager = asyncio.run(main())
+        self.assertEqual(manager._batch_depth, 0)
+        manager.add_contact(self.sanjay)  # back to writing straight through
+        self.assertEqual(len(ContactManager(self.storage).contacts), 2)
+
+    def test_find_duplicates(self):
+        self.manager.add_contacts([
+            self.ajay,
+            Contact("Ajay ", "+911234567890", "ajay.k@mail.com", "Wonderland"),
+            Contact("Sanjay Kumar", "1987654321", "sanjay@mail.com", "12 Builder Street"),
+            Contact("sanjay  kumar", "5550001111", "sk@other.com", "12, Builder Street"),
+            Contact("Ravi", "5550002222", "ravi@mail.com", "Elsewhere"),
+            Contact("Someone Else", "+15550002222", "else@mail.com", "Far Away Road"),
+            Contact("Unrelated", "5550004444", "u@mail.com", "Nowhere"),
+        ])
+        clusters = self.manager.find_duplicates()
+        self.assertEqual(sorted(sorted(c.phone for c in cluster) for cluster in clusters), [
+            ["+15550002222", "5550002222"],
+            ["+911234567890", "1234567890"],
+            ["1987654321", "5550001111"],
+        ])
+
+    def test_find_duplicates_checks_every_bucket_pair(self):
+        finder = DuplicateFinder()
+        contacts = []
+        for i in range(300):
+            name, address = f"Person Number {i:03d}", f"{i} Long Lane District {i % 7}"
+            contacts.append(Contact(name, f"{7000000000 + 2 * i}", f"a{i}@mail.com", address))
+            contacts.append(Contact(name, f"{7000000001 + 2 * i}", f"b{i}@mail.com", address + "x"))
+        clusters = finder.clusters(contacts)
+        together = {frozenset(c.phone for c in cluster) for cluster in clusters}
+        for a, b in zip(contacts[::2], contacts[1::2]):
+            if jaccard(shingles(a), shingles(b)) < finder.threshold:
+                continue
+            sig_a, sig_b = finder.signature(shingles(a)), finder.signature(shingles(b))
+            if any(sig_a[k:k + finder.rows] == sig_b[k:k + finder.rows]
+                   for k in range(0, len(sig_a), finder.rows)):
+                self.assertTrue(any({a.phone, b.phone} <= group for group in together), a.name)
+
+        script = ("from task4dedupe import DuplicateFinder; "
+                  "print(DuplicateFinder().signature({'aja', 'jay', 'ay|'}))")
+        outputs = {subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                                  env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+                   for seed in ("1", "2")}
+        self.assertEqual(len(outputs), 1)
+
+    def test_binary_snapshot(self):
+        manager = ContactManager(self.storage, binary=True)
+        manager.add_contacts([self.sanjay, self.ajay, Contact("Émile", "5550001111", "emile@mail.com")])
+        with ContactManager.open_snapshot(self.storage + ".bin") as snapshot:
+            self.assertEqual(len(snapshot), 3)
+            self.assertEqual(snapshot[2], ("Émile", "5550001111", "emile@mail.com", ""))
+            self.assertEqual(snapshot.find("ajay@mail.com")[0], "Ajay")
+            self.assertEqual(snapshot.find("1987654321")[0], "Sanjay")
+            self.assertIsNone(snapshot.find("0000000000"))
+
+        reloaded = ContactManager(self.storage, binary=True)
+        self.assertIsNotNone(reloaded._snapshot)  # mapped, nothing decoded yet
+        self.assertEqual(reloaded._by_phone, {})
+        self.assertEqual(reloaded.contacts[1].name, "Ajay")
+        self.assertEqual(reloaded.find_contact("emile@mail.com").phone, "5550001111")
+        self.assertEqual([c.to_dict() for c in reloaded.contacts], [c.to_dict() for c in manager.contacts])
+        reloaded.add_contact(Contact("Late", "5550003333", "late@mail.com"))  # decodes the book first
+        self.assertIsNone(reloaded._snapshot)
+        self.assertEqual(len(reloaded.contacts), 4)
+        self.assertEqual(reloaded.find_contact("ajay@mail.com").name, "Ajay")
+
+        # A JSON write that skips the binary file makes the snapshot stale
+        ContactManager(self.storage).add_contact(Contact("New", "5550002222", "new@mail.com"))
+        stale = ContactManager(self.storage, binary=True)
+        self.assertIsNone(stale._snapshot)
+        self.assertEqual(len(stale.contacts), 5)
+        # ... even one that keeps the file's size and mtime
+        ContactManager(self.storage, binary=True).save()
+        stat = os.stat(self.storage)
+        with open(self.storage, encoding="utf-8") as f:
+            text = f.read()
+        with open(self.storage, "w", encoding="utf-8") as f:
+            f.write(text.replace("Ajay", "Ajax"))
+        os.utime(self.storage, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        edited = ContactManager(self.storage, binary=True)
+        self.assertIsNone(edited._snapshot)
+        self.assertEqual(edited.find_contact("ajay@mail.com").name, "Ajax")
+
+    def test_shared_storage_merges_concurrent_writers(self):
+        first = ContactManager(self.storage, shared=True)
+        second = ContactManager(self.storage, shared=True)
+        first.add_contact(self.ajay)
+        self.assertTrue(second.storage.changed())
+        second.add_contact(self.sanjay)  # stale copy: merged, not clobbered
+        self.assertEqual([c.phone for c in second.contacts], ["1234567890", "1987654321"])
+        second.add_contact(Contact("Clash", "5550001111", "clash@mail.com"))
+        with self.assertRaisesRegex(ValueError, "Duplicate contact detected"):
+            first.add_contact(Contact("Other", "5550001111", "other@mail.com"))
+        self.assertEqual(first.find_contact("5550001111").name, "Clash")
+        self.assertIsNone(first.find_contact("other@mail.com"))
+        self.assertFalse(first.storage.changed())
+        self.assertFalse(second.refresh())  # the losing add wrote nothing
+        self.assertEqual(len(ContactManager(self.storage).contacts), 3)
+        first.add_contact(Contact("Other", "5550002222", "other@mail.com"))
+        self.assertTrue(second.refresh())
+        self.assertEqual(len(second.contacts), 4)
+
+        workers = [multiprocessing.Process(target=add_shared_contacts, args=(self.storage, i * 25, 25))
+                   for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual([w.exitcode for w in workers], [0] * 4)
+        self.assertEqual(len(ContactManager(self.storage).contacts), 104)
+
+    def test_streaming_exports(self):
+        rows = [{"name": f"P{i}", "phone": f"{9000000000 + i}", "email": f"p{i}@mail.com",
+                 "address": "Łódź" if i % 2 else ""} for i in range(25)]
+        self.manager.add_contacts(rows)
+        out = os.path.join(self.tmpdir, "out")
+        os.mkdir(out)
+        for name in ("c.csv.gz", "c.ndjson.xz", "c.json"):
+            paths = self.manager.export(os.path.join(out, name), rows_per_file=10)
+            self.assertEqual([os.path.basename(p) for p in paths],
+                             [name.replace(".", f"-000{i}.", 1) for i in (1, 2, 3)])
+        with gzip.open(os.path.join(out, "c-0003.csv.gz"), "rt", encoding="utf-8", newline="") as f:
+            self.assertEqual(list(csv.DictReader(f)), rows[20:])
+        with lzma.open(os.path.join(out, "c-0002.ndjson.xz"), "rt", encoding="utf-8") as f:
+            self.assertEqual([json.loads(line) for line in f], rows[10:20])
+        with open(os.path.join(out, "c-0001.json"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), json.dumps(rows[:10], indent=4))
+        self.assertEqual("".join(self.manager.export_stream("ndjson")),
+                         "".join(json.dumps(r) + "\n" for r in rows))
+        empty = export_rows([], os.path.join(out, "empty.csv"), rows_per_file=5)
+        with open(empty[0], encoding="utf-8") as f:
+            self.assertEqual(f.read(), "name,phone,email,address\n")
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            backup_file = self.manager.backup(compression="gzip")
+        finally:
+            os.chdir(cwd)
+        with gzip.open(os.path.join(self.tmpdir, backup_file), "rt", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), rows)
+
+    def test_autocomplete(self):
+        for storage in (self.storage, os.path.join(self.tmpdir, "contacts.db")):
+            manager = ContactManager(storage)
+            manager.add_contacts([
+                self.sanjay, self.ajay,
+                Contact("Ajit", "5550001111", "zed@mail.com"),
+                Contact("Zara", "5550002222", "ajax@mail.com"),
+                Contact("Bob", "5550003333", "bob@mail.com"),
+            ])
+            # ajax@mail.com < ajay < ajay@mail.com (same contact, listed once) < ajit
+            self.assertEqual([c.name for c in manager.autocomplete("aj")], ["Zara", "Ajay", "Ajit"])
+            self.assertEqual([c.name for c in manager.autocomplete("AJ", limit=2)], ["Zara", "Ajay"])
+            manager.remove_contact("1234567890")
+            manager.add_contact(Contact("Ajaya", "5550004444", "aa@mail.com"))
+            self.assertEqual([c.name for c in manager.autocomplete("aja")], ["Zara", "Ajaya"])
+            self.assertEqual(manager.autocomplete("x"), [])
+            self.assertEqual(manager.autocomplete(""), [])
+
+    def test_query_planner(self):
+        for storage in (self.storage, os.path.join(self.tmpdir, "contacts.db")):
+            manager = ContactManager(storage)
+            rows = [{"name": f"N{i % 7}", "phone": f"{9000000000 + i}", "email": f"p{i:03}@mail.com",
+                     "address": f"{i} {'Main' if i % 2 else 'Lake'} Street"} for i in range(200)]
+            manager.add_contacts(rows)
+            queries = ['name^="N1" and address~"MAIN"', 'email="p007@mail.com"', 'phone>="9000000190"',
+                       'address~"lake" and name="N3"', 'address^="19" and phone<"9000000195"',
+                       'name="N2" AND email<="p050@mail.com" and address~"street"']
+            for text in queries:
+                predicates = parse_query(text)
+                expected = {c.phone for c in manager.contacts if all(matches(c, p) for p in predicates)}
+                result = manager.query(text)
+                self.assertEqual({c.phone for c in result}, expected, text)
+                self.assertEqual({c.phone for c in result}, expected)  # can be iterated again
+            if not manager._sql:
+                self.assertTrue(manager.query('phone>"9000000190"').explain().startswith("full scan"))
+                self.assertEqual((manager._sorted_views, manager._trigrams), ({}, None))  # none built
+                manager.page("phone", limit=1)
+                manager.search("lake")
+                self.assertEqual(manager.query('email="p007@mail.com" and name^="N"').explain(),
+                                 "hash lookup: email = 'p007@mail.com'\nfilter: name ^= 'N'")
+                self.assertTrue(manager.query('name="N3" and phone>"9000000190"').explain()
+                                .startswith("sorted view range: phone > '9000000190' (9 entries)"))
+                self.assertTrue(manager.query('address~"3 lake"').explain().startswith("trigram index"))
+                self.assertTrue(manager.query('address^="1"').explain().startswith("full scan"))
+                self.assertEqual([c.phone for c in manager.query('phone>"9000000197"')],
+                                 ["9000000198", "9000000199"])
+            else:
+                self.assertIn("contacts_email", manager.query('email="p007@mail.com"').explain())
+        self.assertEqual(parse_query(r'name="say \"hi\""'), [("name", "=", 'say "hi"')])
+        for bad in ('name="x" or phone="1"', 'age="3"', 'name=x'):
+            with self.assertRaises(ValueError):
+                parse_query(bad)
+
+    def test_external_dedupe_import(self):
+        source = os.path.join(self.tmpdir, "feed.csv")
+        rows = []
+        for i in range(3000):
+            rows.append((f"P{i}", f"{9000000000 + i}", f"p{i}@mail.com", f"{i}, Main Street"))
+            if i % 7 == 0:
+                rows.append((f"Phone dup {i}", f"{9000000000 + i}", f"other{i}@mail.com", ""))
+            if i % 11 == 0:
+                rows.append((f"Email dup {i}", f"{8000000000 + i}", f"P{i}@MAIL.com", ""))
+            if i % 13 == 0:
+                rows.append(("Bad", "12", f"bad{i}@mail.com", ""))
+        # A chain: the phone dup of P7 was dropped, so its email is free for "Chained";
+        # "Late" loses its phone to it, leaving its email to "Later", which beats "Last"
+        rows.append(("Chained", "5550001111", "other7@mail.com", ""))
+        rows.append(("Late", "5550001111", "late@mail.com", ""))
+        rows.append(("Later", "5550002222", "late@mail.com", ""))
+        rows.append(("Last", "5550002222", "last@mail.com", ""))
+        with open(source, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(("name", "phone", "email", "address"))
+            writer.writerows(rows)
+        output = os.path.join(self.tmpdir, "clean.json")
+        rejects = os.path.join(self.tmpdir, "rejects.csv")
+        stats = dedupe_csv(source, output, memory_budget=8 * 1024, tmpdir=self.tmpdir, rejects=rejects)
+        self.assertGreater(stats.runs, 64)  # small budget: many runs, merged in two levels
+        self.assertEqual(stats, (len(rows), 3002, 231, len(rows) - 3002 - 231, stats.runs))
+        loaded = ContactManager(output)
+        self.assertEqual([c.name for c in loaded.contacts], [f"P{i}" for i in range(3000)] + ["Chained", "Later"])
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["clean.json", "feed.csv", "rejects.csv"])
+        serial = self.manager.import_from_csv(source)
+        self.assertEqual([c.to_dict() for c in loaded.contacts], [c.to_dict() for c in self.manager.contacts])
+        with open(rejects, encoding="utf-8") as f:
+            reported = list(csv.reader(f))
+        self.assertEqual(reported[0], ["5", "Invalid phone number format"])
+        self.assertEqual(reported[-1], [str(len(rows) + 1), "Duplicate phone: 5550002222"])
+        self.assertEqual(sorted(int(line) for line, _ in reported), [line for line, _ in serial.rejected])
+
+    def test_versioned_manager_publishes_adopted_records(self):
+        first = ContactManager(self.storage, shared=True)
+        book = VersionedContactManager(ContactManager(self.storage, shared=True))
+        first.add_contact(self.ajay)
+        first.add_contact(Contact("Clash", "5550001111", "clash@mail.com"))
+        with self.assertRaisesRegex(ValueError, "Duplicate contact detected"):
+            book.add_contact(Contact("Other", "5550001111", "other@mail.com"))
+        # The conflict adopted first's records; readers see them at once
+        self.assertEqual(book.find_contact("ajay@mail.com").name, "Ajay")
+        self.assertIsNone(book.find_contact("other@mail.com"))
+        book.add_contact(self.sanjay)
+        self.assertEqual(sorted(c.phone for c in book.snapshot()),
+                         sorted(c.phone for c in book.manager.contacts))
+        self.assertEqual(len(book.snapshot()), 3)
+
+    def test_versioned_readers_under_concurrent_writes(self):
+        manager = ContactManager(self.storage, journal=True)
+        manager.add_contacts([{"name": f"P{i}", "phone": f"{9000000000 + i}", "email": f"p{i}@mail.com"}
+                              for i in range(1500)])
+        book = VersionedContactManager(manager)
+        before = book.snapshot()
+        book.add_contact(self.ajay)
+        self.assertIsNone(before.find("1234567890"))
+        self.assertIs(book.find_contact("ajay@mail.com"), self.ajay)
+        self.assertEqual(len(before), 1500)
+
+        errors = []
+        done = threading.Event()
+
+        def write():
+            try:
+                for i in range(200):
+                    book.add_contact(Contact(f"W{i}", f"{8000000000 + i}", f"w{i}@mail.com"))
+                    if i % 2:
+                        book.remove_contact(f"{8000000000 + i - 1}")
+                    if i % 50 == 0:
+                        book.add_contacts([{"name": "Dup", "phone": "1234567890", "email": "x@mail.com"},
+                                           {"name": f"B{i}", "phone": f"{7000000000 + i}", "email": f"b{i}@mail.com"}])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        def read():
+            try:
+                while not done.is_set():
+                    snapshot = book.snapshot()
+                    contacts = list(snapshot)
+                    if len(contacts) != len(snapshot):
+                        errors.append(("length", len(contacts), len(snapshot)))
+                    for contact in contacts[::97]:
+                        if snapshot.find(contact.phone) is not contact or snapshot.find(contact.email) is not contact:
+                            errors.append(("find", contact.phone))
+                    if book.find_contact("9000000042") is None or not book.search("p1499@"):
+                        errors.append("stable contact missing")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        manager.storage.wait()
+        self.assertEqual([c.phone for c in book.contacts], [c.phone for c in manager.contacts])
+        self.assertEqual(len(book.contacts), 1500 + 1 + 100 + 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import threading
+
+CHUNK_SIZE = 512
+SHARDS = 256
+
+
+class ContactVersion:
+    """Immutable version of a contact book that shares structure with the
+    versions before and after it.
+
+    Contacts sit in chunks of up to CHUNK_SIZE; the phone and email maps
+    are split into SHARDS dicts by key hash. A change copies only the
+    chunks and shards it touches plus the small tuples pointing at them,
+    so publishing a version costs O(chunk + shard) rather than O(n), and
+    a version, once built, is never modified: any number of threads can
+    read it without locks.
+    """
+
+    __slots__ = ("chunks", "phones", "emails", "count")
+
+    def __init__(self, chunks, phones, emails, count):
+        self.chunks = chunks    # tuple of tuples of contacts
+        self.phones = phones    # tuple of SHARDS dicts: phone -> (contact, chunk number)
+        self.emails = emails    # tuple of SHARDS dicts: email -> contact
+        self.count = count
+
+    @classmethod
+    def build(cls, contacts):
+        contacts = list(contacts)
+        chunks = tuple(tuple(contacts[i:i + CHUNK_SIZE]) for i in range(0, len(contacts), CHUNK_SIZE))
+        phones = [{} for _ in range(SHARDS)]
+        emails = [{} for _ in range(SHARDS)]
+        for number, chunk in enumerate(chunks):
+            for contact in chunk:
+                phones[hash(contact.phone) % SHARDS][contact.phone] = contact, number
+                emails[hash(contact.email) % SHARDS][contact.email] = contact
+        return cls(chunks, tuple(phones), tuple(emails), len(contacts))
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def find(self, keyword):
+        """Contact with this phone or email, or None"""
+        entry = self.phones[hash(keyword) % SHARDS].get(keyword)
+        if entry is not None:
+            return entry[0]
+        return self.emails[hash(keyword) % SHARDS].get(keyword)
+
+    def search(self, keyword):
+        """Same matches, in the same order, as ContactManager.search"""
+        needle = keyword.lower()
+        return [
+            c for c in self
+            if needle in c.name.lower()
+            or keyword in c.phone
+            or needle in c.email.lower()
+            or needle in c.address.lower()
+        ]
+
+    def changed(self, added=(), removed=()):
+        """New version with `added` appended and `removed` taken out"""
+        chunks = list(self.chunks)
+        phones = list(self.phones)
+        emails = list(self.emails)
+        copied = set()  # (kind, shard number) already copied for this version
+
+        def shard(maps, kind, key):
+            number = hash(key) % SHARDS
+            if (kind, number) not in copied:
+                copied.add((kind, number))
+                maps[number] = dict(maps[number])
+            return maps[number]
+
+        for contact in removed:
+            _, number = shard(phones, "p", contact.phone).pop(contact.phone)
+            shard(emails, "e", contact.email).pop(contact.email, None)
+            chunk = list(chunks[number])
+            chunk.remove(contact)
+            chunks[number] = tuple(chunk)
+        if added:
+            # Refill the last chunk, then open new ones
+            tail = list(chunks.pop()) if chunks and len(chunks[-1]) < CHUNK_SIZE else []
+            tail.extend(added)
+            for i in range(0, len(tail), CHUNK_SIZE):
+                chunk = tuple(tail[i:i + CHUNK_SIZE])
+                for contact in chunk:
+                    shard(phones, "p", contact.phone)[contact.phone] = contact, len(chunks)
+                    shard(emails, "e", contact.email)[contact.email] = contact
+                chunks.append(chunk)
+        count = self.count + len(added) - len(removed)
+        if len(chunks) > 2 * (count // CHUNK_SIZE + 1):
+            # Mostly emptied by removals: repack instead of carrying empty chunks
+            return ContactVersion.build(c for chunk in chunks for c in chunk)
+        return ContactVersion(tuple(chunks), tuple(phones), tuple(emails), count)
+
+
+class VersionedContactManager:
+    """ContactManager front end with snapshot isolation for readers.
+
+    Reads go to the current ContactVersion, taken with a single attribute
+    read and never locked, so they run concurrently with each other and
+    with a writer. Mutations are serialized by a lock, applied to the
+    manager (validation, indexes, persistence) and then published as a new
+    version that shares everything it did not change with the last one.
+    A mutation that fails is still published: a shared-storage conflict
+    may have replaced the manager's book before raising.
+    Hold on to snapshot() to make several reads see the same book.
+
+    Reader searches scan the version; the manager's trigram index is not
+    versioned and stays writer-side.
+    """
+
+    def __init__(self, manager):
+        if manager._sql:
+            raise ValueError("SQLite storage is already isolated per query; use an in-memory manager")
+        manager.wait_until_loaded()
+        self.manager = manager
+        self._lock = threading.Lock()
+        self._version = ContactVersion.build(manager.contacts)
+
+    # ---------- Reads (lock-free) ----------
+    def snapshot(self):
+        return self._version
+
+    @property
+    def contacts(self):
+        return self._version
+
+    def find_contact(self, keyword):
+        return self._version.find(keyword)
+
+    def search(self, keyword):
+        return self._version.search(keyword)
+
+    # ---------- Mutations ----------
+    def _publish(self, contacts_before, added=(), removed=()):
+        manager = self.manager
+        if manager.contacts is contacts_before:
+            if added or removed:
+                self._version = self._version.changed(added, removed)
+        else:
+            # Rolled back, or replaced by a merge: start over from the manager
+            self._version = ContactVersion.build(manager.contacts)
+
+    def add_contact(self, contact):
+        with self._lock:
+            manager = self.manager
+            before, count = manager.contacts, len(manager.contacts)
+            try:
+                manager.add_contact(contact)
+            finally:
+                self._publish(before, added=manager.contacts[count:])
+
+    def add_contacts(self, rows, start=1, workers=None):
+        with self._lock:
+            manager = self.manager
+            before, count = manager.contacts, len(manager.contacts)
+            try:
+                return manager.add_contacts(rows, start, workers)
+            finally:
+                self._publish(before, added=manager.contacts[count:])
+
+    def remove_contact(self, phone):
+        with self._lock:
+            manager = self.manager
+            before = manager.contacts
+            contact = manager.find_contact(phone)
+            removed = False
+            try:
+                removed = manager.remove_contact(phone)
+            finally:
+                self._publish(before, removed=[contact] if removed else ())
+            return removed
+
+    def sort_contacts(self, by="name"):
+        with self._lock:
+            self.manager.sort_contacts(by)
+            self._version = ContactVersion.build(self.manager.contacts)
@@ -1,61 +1,359 @@
+import atexit
 import json
 import csv
+import logging
 import re
 import os
+import tempfile
+import threading
 import time
+import weakref
+from contextlib import suppress
 from datetime import datetime
 from functools import wraps
+from task5metrics import REGISTRY
+from task5calllog import CALL_LOG, RateLimit
+from task5memory import MEMORY_SAMPLING, MemorySection, measuring
+from task5profile import PROFILER
 
 
 # ========== DECORATORS ==========
 
-def timing(func):
-    """Decorator to measure execution time of a function."""
+def timing(func=None, *, sample_every=1, registry=REGISTRY):
+    """Decorator to measure execution time of a function.
+
+    Durations go into a latency histogram in `registry` (keyed by the
+    function's qualified name) instead of being printed; every call is
+    counted, and with sample_every=N only every Nth call is timed. Calls
+    that ran while @track_memory was measuring are counted but not timed,
+    since tracemalloc slows them down. Read them with REGISTRY.snapshot()
+    or REGISTRY.dump(path, "json"/"prometheus").
+    Usable bare (@timing) or with options (@timing(sample_every=10)).
+    """
+    if func is None:
+        return lambda f: timing(f, sample_every=sample_every, registry=registry)
+    histogram = registry.histogram("call_seconds", func.__qualname__)
+    counted = 0 if sample_every > 1 else 1  # sample() counts the call when sampling
+
     @wraps(func)
     def wrapper(*args, **kwargs):
+        if counted == 0 and not histogram.sample(sample_every):
+            return func(*args, **kwargs)
         start = time.perf_counter()
-        result = func(*args, **kwargs)
-        end = time.perf_counter()
-        print(f"⏱️ {func.__name__} executed in {end - start:.4f} seconds")
-        return result
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if not measuring():
+                histogram.record(elapsed, counted)
+            elif counted:
+                histogram.sample()
     return wrapper
 
 
-def log_calls(func):
-    """Decorator to log function calls."""
+def log_calls(func=None, *, level=logging.INFO, sample_every=1, max_per_second=None, logger=CALL_LOG):
+    """Decorator to log method calls as structured records.
+
+    When `level` is below the logger's level the call goes straight
+    through, with no formatting at all. Otherwise one record per call
+    (arguments without self, result or error, duration) is queued for
+    the logger's writer thread, which does the repr work. For hot methods,
+    sample_every=N logs every Nth call and max_per_second caps the rate;
+    skipped calls are counted in the next record's "skipped" field.
+    """
+    if func is None:
+        return lambda f: log_calls(f, level=level, sample_every=sample_every,
+                                   max_per_second=max_per_second, logger=logger)
+    name = func.__qualname__
+    level_name = logging.getLevelName(level)
+    limit = RateLimit(max_per_second) if max_per_second else None
+    calls = 0
+    skipped = 0
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        print(f"📞 Calling: {func.__name__} with args={args[1:]}, kwargs={kwargs}")
-        result = func(*args, **kwargs)
-        print(f"✅ {func.__name__} returned: {result}")
-        return result
+        nonlocal calls, skipped
+        if not logger.enabled(level):
+            return func(*args, **kwargs)
+        calls += 1
+        if calls % sample_every or (limit is not None and not limit.admit()):
+            skipped += 1
+            return func(*args, **kwargs)
+        record = {"time": time.time(), "level": level_name, "call": name, "args": args[1:], "kwargs": kwargs}
+        if skipped:
+            record["skipped"], skipped = skipped, 0
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record["error"] = repr(e)
+            raise
+        else:
+            record["result"] = result
+            return result
+        finally:
+            record["ms"] = round((time.perf_counter() - start) * 1e3, 3)
+            logger.log(record)
+    return wrapper
+
+
+def profiled(func=None, *, profiler=PROFILER):
+    """Decorator (or, given a name, context manager) that profiles when enabled.
+
+    Off unless PROFILE_MODE is "sample" or "cprofile" (or profiler.enable()
+    is called); then calls are aggregated in `profiler` and written to
+    PROFILE_DIR at exit as collapsed stacks plus a hotspot summary.
+    Use as @profiled, @profiled(profiler=p) or `with profiled("import"):`.
+    """
+    if isinstance(func, str):
+        return profiler.section(func)
+    if func is None:
+        return lambda f: profiled(f, profiler=profiler)
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if profiler.mode is None:
+            return func(*args, **kwargs)
+        with profiler.section(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def track_memory(func=None, *, sample_every=None, top=3, registry=REGISTRY, sampling=MEMORY_SAMPLING):
+    """Decorator (or, given a name, context manager) recording allocations with tracemalloc.
+
+    Each measured call adds its peak and net allocation to the
+    "alloc_peak_bytes" / "alloc_net_bytes" histograms in `registry`, and
+    the `top` lines still holding memory at the end to "alloc_line_bytes",
+    next to the @timing data. Tracing slows the measured call down several
+    times, so sample_every=N measures only every Nth call. Without
+    sample_every the rate is sampling.every, which is 0 (off) unless
+    TRACK_MEMORY_EVERY is set. Put it outside @timing so traced calls are
+    kept out of the latency histogram.
+    Use as @track_memory, @track_memory(sample_every=50) or `with track_memory("import"):`.
+    """
+    if isinstance(func, str):
+        return MemorySection(func, top, registry)
+    if func is None:
+        return lambda f: track_memory(f, sample_every=sample_every, top=top, registry=registry, sampling=sampling)
+    name = func.__qualname__
+    calls = registry.histogram("alloc_peak_bytes", name)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        every = sample_every or sampling.every
+        if not every or not calls.sample(every):
+            return func(*args, **kwargs)
+        with MemorySection(name, top, registry, calls=0):
+            return func(*args, **kwargs)
     return wrapper
 
 
 # ========== CONTEXT MANAGER ==========
 
-class SafeFile:
-    """Custom context manager for safe file operations."""
+def _read_umask():
+    # Reading the umask means setting it; done once here, before any of
+    # our threads run, rather than flipping process state on every save
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
 
-    def __init__(self, filename, mode, encoding="utf-8"):
+_UMASK = _read_umask()
+_log = logging.getLogger(__name__)
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(directory):
+    """Make a rename in `directory` durable (POSIX only; a no-op elsewhere)"""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+_GROUPS = weakref.WeakSet()  # live GroupCommits, flushed at exit
+
+
+def _flush_groups():
+    for group in list(_GROUPS):
+        try:
+            group.flush()
+        except Exception:
+            _log.exception("Group commit failed at exit; %d writes not saved", len(group.pending))
+
+
+atexit.register(_flush_groups)
+
+
+class GroupCommit:
+    """Shares one durability round between quick successive atomic writes.
+
+    SafeFile(..., atomic=True, group=g) writes its temp file and hands it
+    here instead of syncing it. Within `delay` seconds, a newer write to
+    the same target replaces the pending one, which is deleted unsynced;
+    then one flush fsyncs what is left, renames it into place and fsyncs
+    each directory once. A target is always either its old or its new
+    complete content, but a write is only durable after the flush: up to
+    `delay` seconds of saves can be lost in a crash. flush() forces it,
+    and runs at exit. Writes a failed flush did not rename are queued
+    again (unless a newer one arrived meanwhile) for the next flush; a
+    failure on the timer thread is logged.
+    """
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.pending = {}  # target path -> temp path
+        self.commits = 0   # flushes that synced something
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()  # keeps flushes, and so renames, in order
+        self._timer = None
+        _GROUPS.add(self)
+
+    def add(self, temp_path, target):
+        with self._lock:
+            superseded = self.pending.pop(target, None)
+            self.pending[target] = temp_path
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._flush_later)
+                self._timer.daemon = True
+                self._timer.start()
+        if superseded:
+            os.remove(superseded)
+
+    def flush(self):
+        """Make every pending write durable now; return how many there were"""
+        with self._commit_lock:
+            with self._lock:
+                pending, self.pending = self.pending, {}
+                timer, self._timer = self._timer, None
+            if timer is not None:
+                timer.cancel()
+            if not pending:
+                return 0
+            count = len(pending)
+            directories = set()
+            try:
+                while pending:
+                    target, temp_path = next(iter(pending.items()))
+                    _fsync_path(temp_path)
+                    os.replace(temp_path, target)
+                    del pending[target]
+                    directories.add(os.path.dirname(os.path.abspath(target)))
+            except BaseException:
+                self._requeue(pending)
+                raise
+            for directory in directories:
+                _fsync_dir(directory)
+            self.commits += 1
+            return count
+
+    def _requeue(self, pending):
+        with self._lock:
+            for target, temp_path in pending.items():
+                if target in self.pending:
+                    os.remove(temp_path)  # superseded while we were flushing
+                else:
+                    self.pending[target] = temp_path
+
+    def _flush_later(self):
+        try:
+            self.flush()
+        except Exception:
+            _log.exception("Group commit failed; %d writes queued for the next flush", len(self.pending))
+
+
+class SafeFile:
+    """Custom context manager for safe file operations.
+
+    With atomic=True (write modes only) the data goes to a temp file in the
+    target's directory through a `buffer_size` buffer; on a clean exit it
+    is fsynced and renamed over the target and the directory is fsynced,
+    so a crash mid-write leaves the old file intact. On an exception the
+    temp file is removed. Pass a GroupCommit as `group` to let several
+    quick saves share one sync.
+    """
+
+    def __init__(self, filename, mode, encoding="utf-8", *, atomic=False, buffer_size=1 << 20, group=None):
+        if atomic and ("w" not in mode or "+" in mode):
+            raise ValueError("Atomic mode only supports 'w' and 'wb'")
         self.filename = filename
         self.mode = mode
         self.encoding = encoding
+        self.atomic = atomic
+        self.buffer_size = buffer_size
+        self.group = group
+        self.temp_path = None
         self.file = None
 
     def __enter__(self):
         print(f"📂 Opening file: {self.filename} in mode {self.mode}")
-        self.file = open(self.filename, self.mode, encoding=self.encoding, newline="")
+        encoding, newline = (None, None) if "b" in self.mode else (self.encoding, "")
+        if not self.atomic:
+            self.file = open(self.filename, self.mode, encoding=encoding, newline=newline)
+            return self.file
+        directory, name = os.path.split(os.path.abspath(self.filename))
+        fd, self.temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+        try:
+            os.chmod(self.temp_path, self._target_mode())
+            self.file = os.fdopen(fd, self.mode, buffering=self.buffer_size, encoding=encoding, newline=newline)
+        except BaseException:
+            os.close(fd)
+            os.remove(self.temp_path)
+            raise
         return self.file
 
+    def _target_mode(self):
+        """Keep the target's permissions (mkstemp creates 0600)"""
+        try:
+            return os.stat(self.filename).st_mode & 0o7777
+        except FileNotFoundError:
+            return 0o666 & ~_UMASK
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.file:
-            self.file.close()
+            if self.atomic:
+                self._commit(exc_type is None)
+            else:
+                self.file.close()
             print(f"📁 Closed file: {self.filename}")
         if exc_type:
             print(f"⚠️ Exception in file operation: {exc_val}")
         return False  # propagate exceptions
 
+    def _commit(self, ok):
+        try:
+            if not ok:
+                return
+            self.file.flush()
+            if self.group is None:
+                os.fsync(self.file.fileno())
+            self.file.close()
+            if self.group is not None:
+                self.group.add(self.temp_path, self.filename)
+            else:
+                os.replace(self.temp_path, self.filename)
+                _fsync_dir(os.path.dirname(os.path.abspath(self.filename)))
+            self.temp_path = None
+        finally:
+            # Not yet closed if anything above failed; a close that retries a
+            # failed flush must not stop the temp file from being removed
+            with suppress(OSError):
+                self.file.close()
+            if self.temp_path is not None:
+                os.remove(self.temp_path)  # failed or interrupted: the target is untouched
+
 
 # ========== CONTACT SYSTEM ==========
 
@@ -93,15 +391,35 @@ class Contact:
 class ContactManager:
     """Manages contacts with decorators and safe file handling."""
 
-    def __init__(self, storage_file="contacts.json"):
+    def __init__(self, storage_file="contacts.json", group_commit=None):
         self.storage_file = storage_file
+        self.group_commit = group_commit  # a GroupCommit batches save() fsyncs
         self.contacts = []
+        self._by_phone = {}
+        self._by_email = {}
         self.load()
 
+    # ---------- Indexes ----------
+    def _index(self, contact):
+        self._by_phone[contact.phone] = contact
+        self._by_email[contact.email] = contact
+
+    def _unindex(self, contact):
+        self._by_phone.pop(contact.phone, None)
+        self._by_email.pop(contact.email, None)
+
+    def _reindex(self):
+        self._by_phone = {c.phone: c for c in self.contacts}
+        self._by_email = {c.email: c for c in self.contacts}
+
     # ---------- Persistence ----------
+    @track_memory
     @timing
     @log_calls
+    @profiled
     def load(self):
+        if self.group_commit is not None:
+            self.group_commit.flush()  # read what was saved, not what is still pending
         if os.path.exists(self.storage_file):
             with SafeFile(self.storage_file, "r") as f:
                 try:
@@ -111,38 +429,43 @@ class ContactManager:
                     self.contacts = []
         else:
             self.contacts = []
+        self._reindex()
 
+    @track_memory
     @timing
     @log_calls
+    @profiled
     def save(self):
-        with SafeFile(self.storage_file, "w") as f:
+        with SafeFile(self.storage_file, "w", atomic=True, group=self.group_commit) as f:
             json.dump([c.to_dict() for c in self.contacts], f, indent=4)
 
     # ---------- Core Features ----------
     @log_calls
+    @profiled
     def add_contact(self, contact):
         if self.find_contact(contact.phone) or self.find_contact(contact.email):
             raise ValueError("Duplicate contact detected")
         self.contacts.append(contact)
+        self._index(contact)
         self.save()
 
     @log_calls
+    @profiled
     def remove_contact(self, phone):
         contact = self.find_contact(phone)
         if contact:
             self.contacts.remove(contact)
+            self._unindex(contact)
             self.save()
             return True
         return False
 
-    @log_calls
+    @log_calls(level=logging.DEBUG, sample_every=100, max_per_second=50)
     def find_contact(self, keyword):
-        for c in self.contacts:
-            if c.phone == keyword or c.email == keyword:
-                return c
-        return None
+        return self._by_phone.get(keyword) or self._by_email.get(keyword)
 
-    @log_calls
+    @log_calls(level=logging.DEBUG, sample_every=100, max_per_second=50)
+    @profiled
     def search(self, keyword):
         return [
             c for c in self.contacts
@@ -153,6 +476,7 @@ class ContactManager:
         ]
 
     @log_calls
+    @profiled
     def sort_contacts(self, by="name"):
         if by not in {"name", "phone", "email"}:
             raise ValueError("Can only sort by name, phone, or email")
@@ -160,6 +484,7 @@ class ContactManager:
 
     # ---------- Import / Export ----------
     @log_calls
+    @profiled
     def export_to_csv(self, filename="contacts.csv"):
         with SafeFile(filename, "w") as f:
             writer = csv.DictWriter(f, fieldnames=["name", "phone", "email", "address"])
@@ -168,6 +493,7 @@ class ContactManager:
                 writer.writerow(c.to_dict())
 
     @log_calls
+    @profiled
     def import_from_csv(self, filename):
         with SafeFile(filename, "r") as f:
             reader = csv.DictReader(f)
@@ -180,6 +506,7 @@ class ContactManager:
     # ---------- Backup ----------
     @timing
     @log_calls
+    @profiled
     def backup(self):
         backup_file = f"backup_contacts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         with SafeFile(backup_file, "w") as f:
@@ -0,0 +1,143 @@
+import contextlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from task5 import GroupCommit, SafeFile, log_calls, profiled, timing, track_memory
+from task5calllog import CallLogger
+from task5metrics import MetricsRegistry
+from task5profile import Profiler
+
+
+def per_call(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def bench_timing(calls=200_000):
+    """Per-call overhead of @timing on a function that does nothing"""
+    print("=== @timing overhead ===")
+    registry = MetricsRegistry()
+
+    def bare():
+        pass
+
+    variants = {
+        "undecorated": bare,
+        "@timing": timing(bare, registry=registry),
+        "@timing(sample_every=10)": timing(sample_every=10, registry=registry)(bare),
+    }
+    baseline = per_call(bare, calls)
+    for label, func in variants.items():
+        cost = per_call(func, calls)
+        print(f"{label:>26}: {cost * 1e9:6.0f} ns/call (+{(cost - baseline) * 1e9:.0f} ns)")
+
+
+def print_logged(func):
+    """The print-based log_calls this module replaced"""
+    def wrapper(*args, **kwargs):
+        print(f"📞 Calling: {func.__name__} with args={args[1:]}, kwargs={kwargs}")
+        result = func(*args, **kwargs)
+        print(f"✅ {func.__name__} returned: {result}")
+        return result
+    return wrapper
+
+
+def bench_log_calls(calls=20_000, result_size=1000):
+    """Cost per call of logging a method that returns a 1000-item list"""
+    print("=== @log_calls overhead ===")
+    result = list(range(result_size))
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        for label, decorate in (
+            ("print (old)", print_logged),
+            ("level disabled", log_calls(level=logging.DEBUG, logger=CallLogger(devnull))),
+            ("enabled", log_calls(logger=CallLogger(devnull, queue_size=calls))),
+            ("sample_every=100", log_calls(sample_every=100, logger=CallLogger(devnull))),
+        ):
+            search = decorate(lambda self: result)
+            with contextlib.redirect_stdout(devnull):
+                cost = per_call(lambda: search(None), calls)
+            print(f"{label:>18}: {cost * 1e6:8.2f} us/call on the calling thread")
+
+
+def bench_profiled(calls=200_000, work_calls=200):
+    """@profiled when off (the permanent state) and when on, on a short call"""
+    print("=== @profiled overhead ===")
+    profiler = Profiler()
+
+    def bare():
+        pass
+
+    def work():
+        return sorted(range(2000), key=lambda i: -i)
+
+    decorated, decorated_work = profiled(bare, profiler=profiler), profiled(work, profiler=profiler)
+    baseline = per_call(bare, calls)
+    cost = per_call(decorated, calls)
+    print(f"{'disabled':>18}: {cost * 1e9:6.0f} ns/call (+{(cost - baseline) * 1e9:.0f} ns)")
+    baseline = per_call(work, work_calls)
+    for mode in ("sample", "cprofile"):
+        profiler.enable(mode)
+        cost = per_call(decorated_work, work_calls)
+        profiler.disable()
+        print(f"{mode:>18}: {cost * 1e6:6.0f} us/call on a {baseline * 1e6:.0f} us call")
+
+
+def bench_track_memory(n=5000, calls=100):
+    """@track_memory on a save-like call: list of dicts plus one JSON string"""
+    print("=== @track_memory overhead ===")
+    registry = MetricsRegistry()
+    rows = [{"name": f"Person {i}", "phone": f"9{i:09d}", "email": f"p{i}@mail.com", "address": ""}
+            for i in range(n)]
+
+    def serialize():
+        return len(json.dumps([dict(row) for row in rows], indent=4))
+
+    baseline = per_call(serialize, calls)
+    print(f"{'untracked':>18}: {baseline * 1e3:6.2f} ms/call")
+    for label, every in (("every call", 1), ("sample_every=20", 20)):
+        func = track_memory(serialize, sample_every=every, registry=registry)
+        cost = per_call(func, calls)
+        print(f"{label:>18}: {cost * 1e3:6.2f} ms/call (+{(cost - baseline) / baseline:.0%})")
+    peak = registry.snapshot()["alloc_peak_bytes"][serialize.__qualname__]["max"]
+    print(f"{'peak':>18}: {peak / 2 ** 20:6.2f} MiB for {n} rows")
+
+
+def bench_safefile(n=1000, saves=50):
+    """Saves per second of a contacts.json-sized dump: plain "w" vs atomic vs group commit"""
+    print("=== SafeFile save throughput ===")
+    data = [{"name": f"Person {i}", "phone": f"9{i:09d}", "email": f"p{i}@mail.com", "address": ""}
+            for i in range(n)]
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "contacts.json")
+    group = GroupCommit(delay=0.05)
+    try:
+        for label, options in (
+            ("plain (old)", {}),
+            ("atomic", {"atomic": True}),
+            ("atomic, 64 KiB", {"atomic": True, "buffer_size": 1 << 16}),
+            ("group commit", {"atomic": True, "group": group}),
+        ):
+            with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                for _ in range(saves):
+                    with SafeFile(path, "w", **options) as f:
+                        json.dump(data, f, indent=4)
+                group.flush()
+                elapsed = time.perf_counter() - start
+            print(f"{label:>18}: {saves / elapsed:7.0f} saves/s")
+        print(f"{'':>18}  group commit synced {group.commits} time(s) for {saves} saves")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    bench_timing()
+    bench_log_calls()
+    bench_profiled()
+    bench_track_memory()
+    bench_safefile()
@@ -0,0 +1,124 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import reprlib
+import sys
+import threading
+import time
+
+_STOP = object()
+
+
+def _short_repr():
+    r = reprlib.Repr()
+    r.maxstring = r.maxother = 120
+    r.maxlist = r.maxtuple = r.maxdict = r.maxset = 10
+    return r
+
+
+class CallLogger:
+    """Structured call log written by a background thread.
+
+    Callers check enabled(level) first and do nothing else when it is off.
+    Records carry the raw arguments and result; the writer thread turns
+    them into one JSON line each, with reprs truncated by reprlib, so the
+    calling thread never formats anything. The queue is bounded: when the
+    writer falls behind, new records are dropped and counted rather than
+    blocking the caller, and the count is reported in the log.
+    """
+
+    def __init__(self, stream=None, level=logging.INFO, queue_size=10_000):
+        self.stream = stream
+        self.level = level
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self._reported = 0
+        self._repr = _short_repr().repr
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, record):
+        """Queue a record dict; values are formatted later, on the writer thread"""
+        if self._writer is None:
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_records, name="call-log", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _format(self, record):
+        shown = {}
+        for key, value in record.items():
+            if key in ("args", "kwargs", "result"):
+                value = self._repr(value)
+            shown[key] = value
+        return json.dumps(shown, default=str)
+
+    def _write_records(self):
+        stream = self.stream or sys.stdout
+        while True:
+            record = self.queue.get()
+            try:
+                if record is _STOP:
+                    return
+                lines = [self._format(record)]
+                if self.dropped > self._reported:
+                    lines.append(json.dumps({"level": "WARNING", "dropped": self.dropped - self._reported}))
+                    self._reported = self.dropped
+                stream.write("\n".join(lines) + "\n")
+                if self.queue.empty():
+                    stream.flush()
+            except Exception:
+                pass  # a broken log stream must not take the writer down
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Wait until every queued record has been written"""
+        if self._writer is not None:
+            self.queue.join()
+
+    def close(self):
+        if self._writer is not None:
+            self.queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+
+
+class RateLimit:
+    """At most `per_second` admitted events per wall-clock second"""
+
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self.second = None
+        self.count = 0
+
+    def admit(self):
+        second = int(time.monotonic())
+        if second != self.second:
+            self.second = second
+            self.count = 0
+        if self.count >= self.per_second:
+            return False
+        self.count += 1
+        return True
+
+
+def _env_level(name, default=logging.INFO):
+    level = logging.getLevelName(os.environ.get(name, "").upper())
+    return level if isinstance(level, int) else default
+
+
+CALL_LOG = CallLogger(level=_env_level("CALL_LOG_LEVEL"))
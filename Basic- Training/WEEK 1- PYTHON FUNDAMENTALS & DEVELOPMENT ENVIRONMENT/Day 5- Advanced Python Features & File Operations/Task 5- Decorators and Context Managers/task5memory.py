@@ -0,0 +1,101 @@
+import os
+import threading
+import tracemalloc
+from task5metrics import REGISTRY
+
+_measuring = threading.Lock()  # tracemalloc is process-wide: one measurement at a time
+_OWN_FRAMES = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+
+
+def measuring():
+    """True while a MemorySection is measuring, so tracemalloc is slowing every allocation"""
+    return _measuring.locked()
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_OWN_FRAMES)
+
+
+class MemorySection:
+    """Context manager recording the memory a block allocates.
+
+    Per measurement, into `registry`:
+      alloc_peak_bytes[name]  highest traced memory above the starting point
+      alloc_net_bytes[name]   memory still held at the end (freed-more counts as 0 in quantiles)
+      alloc_line_bytes["name file:line"]  the `top` source lines holding the most of it
+
+    tracemalloc is started for the block and stopped after it, so nothing
+    is traced between measurements; if it was already running (e.g.
+    PYTHONTRACEMALLOC), a snapshot taken on entry is diffed instead.
+    Measurements do not nest or overlap: a block entered while another is
+    being measured, on any thread, runs unmeasured. Allocations made by
+    other threads during the block are included.
+    """
+
+    __slots__ = ("name", "top", "registry", "calls", "measuring", "started", "before", "baseline")
+
+    def __init__(self, name, top=3, registry=REGISTRY, calls=1):
+        self.name = name
+        self.top = top
+        self.registry = registry
+        self.calls = calls  # 0 when the caller already counted the call (sampling)
+        self.measuring = False
+
+    def __enter__(self):
+        self.measuring = _measuring.acquire(blocking=False)
+        if not self.measuring:
+            if self.calls:
+                self.registry.histogram("alloc_peak_bytes", self.name).sample()
+            return self
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        self.before = None if self.started or not self.top else _snapshot()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.measuring:
+            return False
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            lines = []
+            if self.top:
+                after = _snapshot()
+                if self.before is None:
+                    lines = [(s.traceback[0], s.size) for s in after.statistics("lineno")[:self.top]]
+                else:
+                    lines = [(s.traceback[0], s.size_diff) for s in after.compare_to(self.before, "lineno")
+                             if s.size_diff > 0][:self.top]
+        finally:
+            if self.started:
+                tracemalloc.stop()
+            self.before = None
+            _measuring.release()
+        registry = self.registry
+        registry.histogram("alloc_peak_bytes", self.name).record(peak - self.baseline, self.calls)
+        registry.histogram("alloc_net_bytes", self.name).record(current - self.baseline, self.calls)
+        for frame, size in lines:
+            key = f"{self.name} {os.path.basename(frame.filename)}:{frame.lineno}"
+            registry.histogram("alloc_line_bytes", key).record(size)
+        return False
+
+
+class MemorySampling:
+    """How often @track_memory measures functions that set no rate of their
+    own: every Nth call, 0 for never. Starts from TRACK_MEMORY_EVERY; set
+    `every` to switch tracking on or off at runtime."""
+
+    def __init__(self, every=0):
+        self.every = every
+
+
+def _env_every(name):
+    try:
+        return max(int(os.environ.get(name, "0")), 0)
+    except ValueError:
+        return 0
+
+
+MEMORY_SAMPLING = MemorySampling(_env_every("TRACK_MEMORY_EVERY"))
@@ -0,0 +1,137 @@
+import json
+import math
+import os
+import threading
+
+BUCKETS_PER_DOUBLING = 8  # bucket bounds grow by 2 ** (1/8): quantiles are within ~9%
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Log-bucketed histogram of positive values (seconds, bytes, ...).
+
+    Bucket i counts values in [2 ** (i/8), 2 ** ((i+1)/8)), so any range
+    from nanoseconds to hours fits in a few hundred sparse buckets and a
+    record() is one log2 and a dict update. `calls` counts every call,
+    including ones a sampling caller chose not to measure.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.calls = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.buckets = {}
+            self.calls = self.count = 0
+            self.total = self.max = 0.0
+
+    def sample(self, every=1):
+        """Count a call; True if it is one of every `every` calls to measure"""
+        with self.lock:
+            self.calls += 1
+            return self.calls % every == 0
+
+    def record(self, value, calls=1):
+        """Add a measured value; `calls` is 0 when sample() already counted the call"""
+        index = math.floor(math.log2(value) * BUCKETS_PER_DOUBLING) if value > 0 else None
+        with self.lock:
+            self.calls += calls
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (capped at max)"""
+        with self.lock:
+            buckets = sorted(self.buckets.items(), key=lambda item: -math.inf if item[0] is None else item[0])
+            count, largest = self.count, self.max
+        rank = q * count
+        seen = 0
+        for index, n in buckets:
+            seen += n
+            if seen >= rank:
+                return 0.0 if index is None else min(2 ** ((index + 1) / BUCKETS_PER_DOUBLING), largest)
+        return largest
+
+    def snapshot(self):
+        summary = {"calls": self.calls, "count": self.count, "sum": self.total, "max": self.max}
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}"] = self.quantile(q)
+        return summary
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """In-process store of named histograms, e.g. ("call_seconds", "ContactManager.load").
+
+    Nothing is written anywhere until dump() is called, so recording stays
+    cheap and stdout stays quiet.
+    """
+
+    def __init__(self):
+        self.metrics = {}  # metric -> {key: Histogram}
+        self.lock = threading.Lock()
+
+    def histogram(self, metric, key):
+        histograms = self.metrics.get(metric)
+        if histograms is None or key not in histograms:
+            with self.lock:
+                histogram = self.metrics.setdefault(metric, {}).setdefault(key, Histogram())
+            return histogram
+        return histograms[key]
+
+    def snapshot(self):
+        """{metric: {key: {calls, count, sum, max, p50, p95, p99}}}"""
+        with self.lock:
+            metrics = {metric: dict(histograms) for metric, histograms in self.metrics.items()}
+        return {metric: {key: h.snapshot() for key, h in sorted(histograms.items())}
+                for metric, histograms in sorted(metrics.items())}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=4)
+
+    def to_prometheus(self, prefix="task5"):
+        """Prometheus text exposition: one summary per metric, labelled by key"""
+        lines = []
+        for metric, histograms in self.snapshot().items():
+            name = f"{prefix}_{metric}"
+            lines.append(f"# TYPE {name} summary")
+            for key, s in histograms.items():
+                label = _label(key)
+                for q in QUANTILES:
+                    lines.append(f'{name}{{key="{label}",quantile="{q}"}} {s[f"p{round(q * 100)}"]!r}')
+                lines.append(f'{name}_sum{{key="{label}"}} {s["sum"]!r}')
+                lines.append(f'{name}_count{{key="{label}"}} {s["count"]}')
+            lines.append(f"# TYPE {name}_max gauge")
+            lines.extend(f'{name}_max{{key="{_label(key)}"}} {s["max"]!r}' for key, s in histograms.items())
+            lines.append(f"# TYPE {name}_calls_total counter")
+            lines.extend(f'{name}_calls_total{{key="{_label(key)}"}} {s["calls"]}' for key, s in histograms.items())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, fmt="json"):
+        """Write a snapshot to `path` as "json" or "prometheus", atomically"""
+        text = self.to_prometheus() if fmt == "prometheus" else self.to_json()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        """Zero every histogram (decorators keep theirs, so they are cleared, not dropped)"""
+        with self.lock:
+            histograms = [h for metric in self.metrics.values() for h in metric.values()]
+        for histogram in histograms:
+            histogram.clear()
+
+
+REGISTRY = MetricsRegistry()
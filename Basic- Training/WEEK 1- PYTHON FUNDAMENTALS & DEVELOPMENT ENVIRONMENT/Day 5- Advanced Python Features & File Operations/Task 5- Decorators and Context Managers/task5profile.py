@@ -0,0 +1,256 @@
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+MODES = ("sample", "cprofile")
+
+
+def _frame_label(code):
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _pstats_label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name.replace(";", ":")  # built-in
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+
+class _Section:
+    """Context manager for one profiled region; see Profiler.section()"""
+
+    __slots__ = ("profiler", "name", "entered")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.entered = False
+
+    def __enter__(self):
+        if self.profiler.mode is not None:
+            self.entered = self.profiler._enter(self.name, sys._getframe(1))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.entered:
+            self.profiler._exit()
+        return False
+
+
+class Profiler:
+    """Opt-in profiler for decorated functions and `with` blocks.
+
+    Off (mode None) a section costs one attribute check. In "sample" mode a
+    daemon thread reads the stacks of threads inside a section every
+    `interval` seconds and counts them as collapsed stacks ("a;b;c N"),
+    rooted at the section name, which flamegraph.pl, speedscope and
+    inferno read directly. In "cprofile" mode calls run under one shared
+    cProfile.Profile; only one thread is traced at a time, calls arriving
+    from other threads meanwhile run untraced and are counted as skipped;
+    its collapsed stacks are rebuilt from the caller graph, weighted in
+    microseconds of own time (time under a function called from several
+    places is split in proportion). Both aggregate across calls until
+    reset(); dump() writes the results and a top-N hotspot summary.
+    """
+
+    def __init__(self, mode=None, directory="profiles", interval=0.001, top=20):
+        if mode not in (None,) + MODES:
+            raise ValueError(f"Profile mode must be one of {MODES}")
+        self.mode = None
+        self.directory = directory
+        self.interval = interval
+        self.top = top
+        self.stacks = {}     # collapsed stack -> samples
+        self.sections = {}   # section name -> profiled calls
+        self.skipped = 0
+        self._active = {}    # thread id -> [name, entry frame, depth]
+        self._lock = threading.Lock()
+        self._busy = threading.Event()
+        self._sampler = None
+        self._cprofile = None
+        self._owner = None
+        if mode is not None:
+            self.enable(mode)
+            atexit.register(self.dump)
+
+    def enable(self, mode="sample"):
+        if mode not in MODES:
+            raise ValueError(f"Profile mode must be one of {MODES}")
+        if mode == "cprofile" and self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+        if mode == "sample" and self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+        self.mode = mode
+
+    def disable(self):
+        self.mode = None
+
+    def reset(self):
+        with self._lock:
+            self.stacks = {}
+            self.sections = {}
+            self.skipped = 0
+            if self._owner is None:
+                self._cprofile = cProfile.Profile() if self._cprofile is not None else None
+
+    def section(self, name):
+        return _Section(self, name)
+
+    # ---------- Section bookkeeping ----------
+    def _enter(self, name, frame):
+        thread = threading.get_ident()
+        with self._lock:
+            entry = self._active.get(thread)
+            if entry is not None:
+                entry[2] += 1  # nested section: the outermost one owns the samples
+                return True
+            if self.mode == "cprofile":
+                if self._owner is not None:
+                    self.skipped += 1
+                    return False
+                self._owner = thread
+            self._active[thread] = [name, frame, 1]
+            self.sections[name] = self.sections.get(name, 0) + 1
+            self._busy.set()
+        if self._owner == thread:
+            self._cprofile.enable()
+        return True
+
+    def _exit(self):
+        thread = threading.get_ident()
+        if self._owner == thread and self._active[thread][2] == 1:
+            self._cprofile.disable()
+        with self._lock:
+            entry = self._active[thread]
+            entry[2] -= 1
+            if entry[2] == 0:
+                del self._active[thread]
+                if self._owner == thread:
+                    self._owner = None
+                if not self._active:
+                    self._busy.clear()
+
+    def _sample(self):
+        while True:
+            self._busy.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                active = [(thread, entry[0], entry[1]) for thread, entry in self._active.items()]
+            for thread, name, entry_frame in active:
+                frame = frames.get(thread)
+                labels = []
+                while frame is not None and frame is not entry_frame:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if frame is None:
+                    continue  # the section ended between the two reads
+                labels.append(name)
+                stack = ";".join(reversed(labels))
+                with self._lock:
+                    self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            del frames
+
+    # ---------- Reports ----------
+    def collapsed(self):
+        """Collapsed-stack text, heaviest stacks first"""
+        with self._lock:
+            stacks = self.stacks
+            if not stacks and self._cprofile is not None and self._owner is None:
+                stacks = self._cprofile_stacks()
+            stacks = sorted(stacks.items(), key=lambda item: -item[1])
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _cprofile_stacks(self, max_depth=64):
+        """Collapsed stacks from the cProfile caller graph, in microseconds"""
+        try:
+            stats = pstats.Stats(self._cprofile).stats
+        except TypeError:
+            return {}  # nothing was profiled yet
+        callees = {}
+        for func, (_, _, _, _, callers) in stats.items():
+            for caller, edge in callers.items():
+                callees.setdefault(caller, []).append((func, edge[3]))
+        stacks = {}
+
+        def walk(func, path, seen, total):
+            _, _, own, cumulative, _ = stats[func]
+            share = total / cumulative if cumulative else 0.0
+            weight = round(own * share * 1e6)
+            if weight:
+                stack = ";".join(path)
+                stacks[stack] = stacks.get(stack, 0) + weight
+            if len(path) >= max_depth:
+                return
+            for callee, seconds in callees.get(func, ()):
+                if callee not in seen and seconds * share >= 1e-6:  # skip recursion and noise
+                    walk(callee, path + [_pstats_label(callee)], seen | {callee}, seconds * share)
+
+        for func, (_, _, _, cumulative, callers) in stats.items():
+            if not callers:
+                walk(func, [_pstats_label(func)], {func}, cumulative)
+        return stacks
+
+    def hotspots(self, top=None):
+        """Top-N summary: frames by self samples, or cProfile by own time"""
+        top = top or self.top
+        if self._cprofile is not None and self.mode != "sample":
+            out = io.StringIO()
+            try:
+                pstats.Stats(self._cprofile, stream=out).sort_stats("tottime").print_stats(top)
+            except TypeError:
+                return "No cProfile data\n"  # nothing was profiled yet
+            return out.getvalue()
+        with self._lock:
+            stacks = list(self.stacks.items())
+        total = sum(count for _, count in stacks) or 1
+        own, inclusive = {}, {}
+        for stack, count in stacks:
+            frames = stack.split(";")
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for frame in set(frames):
+                inclusive[frame] = inclusive.get(frame, 0) + count
+        lines = [f"{total} samples, every {self.interval * 1e3:g} ms; sections: {self.sections}",
+                 f"{'self%':>7} {'total%':>7} {'samples':>8}  frame"]
+        for frame, count in sorted(own.items(), key=lambda item: -item[1])[:top]:
+            lines.append(f"{count / total:7.1%} {inclusive[frame] / total:7.1%} {count:8d}  {frame}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory=None):
+        """Write profile.collapsed (or profile.pstats) and hotspots.txt; return their paths"""
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        collapsed = self.collapsed()
+        if collapsed:
+            path = os.path.join(directory, "profile.collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(collapsed)
+            paths.append(path)
+        if self._cprofile is not None and self._owner is None and self.mode != "sample":
+            path = os.path.join(directory, "profile.pstats")
+            try:
+                self._cprofile.dump_stats(path)
+                paths.append(path)
+            except TypeError:
+                pass  # nothing was profiled yet
+        path = os.path.join(directory, "hotspots.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.hotspots())
+        paths.append(path)
+        return paths
+
+
+def _env_mode(name):
+    mode = os.environ.get(name, "").lower()
+    return mode if mode in MODES else None
+
+
+PROFILER = Profiler(_env_mode("PROFILE_MODE"), os.environ.get("PROFILE_DIR", "profiles"))
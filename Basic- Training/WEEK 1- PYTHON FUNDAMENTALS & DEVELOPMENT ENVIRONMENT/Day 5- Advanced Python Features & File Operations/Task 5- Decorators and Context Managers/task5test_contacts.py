@@ -0,0 +1,307 @@
+import errno
+import gc
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+import weakref
+import task5
+from task5 import Contact, ContactManager, GroupCommit, SafeFile, log_calls, profiled, timing, track_memory
+from task5calllog import CallLogger
+from task5memory import MEMORY_SAMPLING
+from task5metrics import REGISTRY, Histogram, MetricsRegistry
+from task5profile import PROFILER, Profiler
+
+class task5test_contacts(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage = os.path.join(self.tmpdir, "contacts.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_timing_records_histograms(self):
+        registry = MetricsRegistry()
+
+        @timing(registry=registry)
+        def slow(seconds):
+            time.sleep(seconds)
+
+        @timing(sample_every=4, registry=registry)
+        def fast():
+            return 1
+
+        for _ in range(9):
+            slow(0.001)
+        slow(0.02)
+        for _ in range(100):
+            self.assertEqual(fast(), 1)
+        stats = registry.snapshot()["call_seconds"]
+        key = slow.__qualname__
+        self.assertEqual((stats[key]["calls"], stats[key]["count"]), (10, 10))
+        self.assertTrue(0.001 <= stats[key]["p50"] < 0.002, stats[key])
+        self.assertEqual(stats[key]["p99"], stats[key]["max"])
+        self.assertGreaterEqual(stats[key]["max"], 0.02)
+        self.assertEqual((stats[fast.__qualname__]["calls"], stats[fast.__qualname__]["count"]), (100, 25))
+
+        path = os.path.join(self.tmpdir, "metrics.prom")
+        registry.dump(path, "prometheus")
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn(f'task5_call_seconds_count{{key="{key}"}} 10\n', text)
+        self.assertIn(f'task5_call_seconds_calls_total{{key="{fast.__qualname__}"}} 100\n', text)
+        registry.dump(path, "json")
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["call_seconds"][key]["count"], 10)
+        registry.reset()
+        slow(0)
+        self.assertEqual(registry.snapshot()["call_seconds"][key]["count"], 1)
+
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+        self.assertAlmostEqual(histogram.quantile(0.95), 950, delta=950 * 0.1)
+
+    def test_manager_persistence_is_timed(self):
+        REGISTRY.reset()
+        manager = ContactManager(self.storage)
+        manager.add_contact(Contact("Ajay", "1234567890", "ajay@mail.com", "Wonderland"))
+        stats = REGISTRY.snapshot()["call_seconds"]
+        self.assertEqual(stats["ContactManager.load"]["calls"], 1)
+        self.assertEqual(stats["ContactManager.save"]["calls"], 1)
+
+    def test_log_calls_structured_and_gated(self):
+        out = io.StringIO()
+        logger = CallLogger(out, level=logging.INFO)
+        reprs = []
+
+        class Big:
+            def __repr__(self):
+                reprs.append(threading.current_thread().name)
+                return "x" * 10_000
+
+        class Book:
+            @log_calls(logger=logger)
+            def add(self, value, twice=False):
+                return [value] * (2 if twice else 1)
+
+            @log_calls(level=logging.DEBUG, logger=logger)
+            def lookup(self, value):
+                return value
+
+            @log_calls(sample_every=10, max_per_second=3, logger=logger)
+            def hot(self):
+                return None
+
+        book = Book()
+        book.add(Big(), twice=True)
+        book.lookup(Big())  # DEBUG is below INFO: no record, no repr
+        for _ in range(100):
+            book.hot()
+        logger.flush()
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        # The argument and both result items, formatted on the writer thread only
+        self.assertEqual(reprs, ["call-log"] * 3)
+        first = records[0]
+        self.assertEqual((first["call"].split(".")[-1], first["level"], first["kwargs"]),
+                         ("add", "INFO", "{'twice': True}"))
+        self.assertLess(len(first["result"]), 300)
+        hot = [r for r in records if r["call"].endswith("hot")]
+        self.assertEqual(len(hot), 3)
+        self.assertEqual(hot[1]["skipped"], 9)
+
+        blocked = threading.Event()
+
+        class SlowStream(io.StringIO):
+            def write(self, text):
+                blocked.wait()
+                return super().write(text)
+
+        slow = CallLogger(SlowStream(), queue_size=2)
+        for i in range(10):
+            slow.log({"call": "x", "args": (i,)})
+        self.assertGreaterEqual(slow.dropped, 7)
+        blocked.set()
+        slow.close()
+        self.assertIn('"dropped"', slow.stream.getvalue())
+
+    def test_profiled_collapsed_stacks_and_hotspots(self):
+        profiler = Profiler(interval=0.0005)
+
+        def spin(seconds):
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                pass
+
+        @profiled(profiler=profiler)
+        def work():
+            spin(0.1)
+
+        work()  # disabled: nothing recorded
+        self.assertEqual((profiler.sections, profiler.stacks), ({}, {}))
+
+        profiler.enable("sample")
+        work()
+        with profiled("block", profiler=profiler):
+            spin(0.05)
+        profiler.disable()
+        lines = profiler.collapsed().splitlines()
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines), lines)
+        self.assertTrue(any(line.startswith(f"{work.__qualname__};") and "spin (" in line for line in lines), lines)
+        self.assertTrue(any(line.startswith("block;") for line in lines), lines)
+        paths = profiler.dump(os.path.join(self.tmpdir, "prof"))
+        self.assertEqual([os.path.basename(p) for p in paths], ["profile.collapsed", "hotspots.txt"])
+        with open(paths[1], encoding="utf-8") as f:
+            hotspots = f.read().splitlines()
+        self.assertIn("spin (", hotspots[2])  # the busiest frame comes first
+
+        PROFILER.reset()
+        PROFILER.enable("cprofile")
+        try:
+            manager = ContactManager(self.storage)
+            for i in range(20):
+                manager.add_contact(Contact(f"Person {i}", f"12345678{i:02d}", f"p{i}@mail.com"))
+        finally:
+            PROFILER.disable()
+        self.assertEqual(PROFILER.sections["ContactManager.add_contact"], 20)
+        self.assertNotIn("ContactManager.save", PROFILER.sections)  # nested in add_contact
+        self.assertIn("dump", PROFILER.hotspots(10))
+        paths = PROFILER.dump(os.path.join(self.tmpdir, "cprof"))
+        self.assertEqual([os.path.basename(p) for p in paths],
+                         ["profile.collapsed", "profile.pstats", "hotspots.txt"])
+        with open(paths[0], encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines), lines)
+        self.assertTrue(any(line.startswith("add_contact (task5.py:") and ";dump (" in line for line in lines), lines)
+        PROFILER.reset()
+
+    def test_track_memory_peak_net_and_lines(self):
+        registry = MetricsRegistry()
+        kept = []
+
+        @track_memory(sample_every=1, registry=registry)
+        def build():
+            scratch = [str(i) * 10 for i in range(20_000)]  # freed on return
+            kept.append(bytearray(500_000))
+            return len(scratch)
+
+        @track_memory(sample_every=5, registry=registry)
+        def small():
+            return [0] * 10
+
+        build()
+        for _ in range(10):
+            small()
+        with track_memory("block", registry=registry):
+            kept.append(bytearray(100_000))
+        self.assertFalse(tracemalloc.is_tracing())  # only on while measuring
+
+        stats = registry.snapshot()
+        peak, net = stats["alloc_peak_bytes"], stats["alloc_net_bytes"]
+        key = build.__qualname__
+        self.assertGreater(peak[key]["max"], net[key]["max"] + 500_000)  # the scratch list
+        self.assertAlmostEqual(net[key]["max"], 500_000, delta=20_000)
+        self.assertEqual((peak[small.__qualname__]["calls"], peak[small.__qualname__]["count"]), (10, 2))
+        self.assertAlmostEqual(net["block"]["max"], 100_000, delta=10_000)
+        lines = sorted(stats["alloc_line_bytes"].items(), key=lambda item: -item[1]["max"])
+        self.assertTrue(lines[0][0].startswith(f"{key} task5test_contacts.py:"), lines[0])
+
+        REGISTRY.reset()
+        manager = ContactManager(self.storage)  # off by default
+        self.assertEqual(REGISTRY.snapshot()["alloc_peak_bytes"]["ContactManager.load"]["calls"], 0)
+        MEMORY_SAMPLING.every = 2
+        try:
+            manager.add_contact(Contact("Ajay", "1234567890", "ajay@mail.com"))
+            manager.add_contact(Contact("Sanjay", "1987654321", "sanjay@mail.com"))
+        finally:
+            MEMORY_SAMPLING.every = 0
+        stats = REGISTRY.snapshot()
+        saves = stats["alloc_peak_bytes"]["ContactManager.save"]
+        self.assertEqual((saves["calls"], saves["count"]), (2, 1))
+        # The traced save is counted but kept out of the latency histogram
+        timed = stats["call_seconds"]["ContactManager.save"]
+        self.assertEqual((timed["calls"], timed["count"]), (2, 1))
+
+    def test_safefile_atomic_and_group_commit(self):
+        path = os.path.join(self.tmpdir, "data.json")
+        with SafeFile(path, "w", atomic=True) as f:
+            f.write("old")
+        os.chmod(path, 0o640)
+        with self.assertRaises(RuntimeError):
+            with SafeFile(path, "w", atomic=True) as f:
+                f.write("half written")
+                raise RuntimeError("crash mid-dump")
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual(os.listdir(self.tmpdir), ["data.json"])  # temp file removed
+
+        class FullDisk:
+            def __init__(self, file):
+                self.file = file
+
+            def flush(self):
+                raise OSError(errno.ENOSPC, "No space left on device")
+
+            def close(self):
+                self.file.close()
+                self.flush()  # close flushes first, and fails the same way
+
+        safe = SafeFile(path, "w", atomic=True)
+        with self.assertRaisesRegex(OSError, "No space"):
+            with safe as f:
+                f.write("new")
+                safe.file = FullDisk(f)
+        self.assertEqual(os.listdir(self.tmpdir), ["data.json"])
+        with SafeFile(path, "wb", atomic=True, buffer_size=16) as f:
+            f.write(b"new" * 100)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+        with self.assertRaises(ValueError):
+            SafeFile(path, "a", atomic=True)
+
+        group = GroupCommit(delay=60)
+        manager = ContactManager(self.storage, group_commit=group)
+        for i in range(5):
+            manager.add_contact(Contact(f"Person {i}", f"12345678{i:02d}", f"p{i}@mail.com"))
+        self.assertEqual(len(group.pending), 1)  # each save replaced the one before
+        self.assertFalse(os.path.exists(self.storage))
+        self.assertEqual(group.flush(), 1)
+        self.assertEqual(group.commits, 1)
+        self.assertEqual(len(ContactManager(self.storage, group_commit=group).contacts), 5)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["contacts.json", "data.json"])
+
+        quick = GroupCommit(delay=0.01)
+        with SafeFile(path, "w", atomic=True, group=quick) as f:
+            f.write("flushed by the timer")
+        time.sleep(0.2)
+        self.assertEqual((quick.commits, quick.pending), (1, {}))
+
+        # A failed timer flush is logged and its writes wait for the next one
+        fsync_path = task5._fsync_path
+        task5._fsync_path = lambda path: (_ for _ in ()).throw(OSError("disk full"))
+        try:
+            with self.assertLogs("task5", "ERROR") as logs:
+                with SafeFile(path, "w", atomic=True, group=quick) as f:
+                    f.write("retried")
+                time.sleep(0.2)
+        finally:
+            task5._fsync_path = fsync_path
+        self.assertIn("disk full", logs.output[0])
+        self.assertEqual(list(quick.pending), [path])
+        self.assertEqual(quick.flush(), 1)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "retried")
+
+        group = weakref.ref(quick)
+        del quick, logs  # the logged traceback holds the failed flush frame
+        gc.collect()
+        self.assertIsNone(group())  # the exit hook does not keep it alive
+
+if __name__ == '__main__':
+    unittest.main()